@@ -0,0 +1,418 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from tldcompat import Config, Crawler, ExtractionPool, git_blob_sha, normalize_repo_url
+from tldcompat.pool import iter_batches
+from tldcompat.repos import MirrorStore
+from tldcompat.util import load_json_file, save_json_file
+
+# === SYNTHETIC CORPUS ===
+
+def attribute_form(line):
+    """"string", "nameof" or "typeof", after the first argument of a testcases.cs attribute."""
+    first = line[len("[HarmonyPatch("):].lstrip()
+    if first.startswith('"'):
+        return "string"
+    return "nameof" if first.startswith("nameof") else "typeof"
+
+ATTRIBUTE_LINES = {}
+for _line in (Path(__file__).parent / "testcases.cs").read_text(encoding='utf-8').splitlines():
+    if _line.strip():
+        ATTRIBUTE_LINES.setdefault(attribute_form(_line.strip()), []).append(_line.strip())
+
+FILLER_LINE = "        if (value > 0) { value -= Time.deltaTime * speed; }\n"
+
+def sample_size(rng, mean_bytes, distribution):
+    if distribution == "fixed":
+        return mean_bytes
+    if distribution == "lognormal":
+        # sigma 1 gives a long tail of a few very large (generated/vendored) files
+        return int(rng.lognormvariate(0, 1) * mean_bytes / 1.6487)
+    return int(rng.expovariate(1 / mean_bytes))
+
+def generate_cs_source(rng, patched_ratio=0.3, mean_bytes=8000, distribution="exp", attribute_mix=None):
+    """One synthetic .cs file: filler code, with a few Harmony attributes in patched files."""
+    attribute_mix = attribute_mix or {form: 1 for form in ATTRIBUTE_LINES}
+    forms, weights = zip(*attribute_mix.items())
+    size = max(200, sample_size(rng, mean_bytes, distribution))
+
+    lines = ["using HarmonyLib;\n", "namespace SyntheticMod {\n"]
+    if rng.random() < patched_ratio:
+        for _ in range(rng.randint(1, 5)):
+            form = rng.choices(forms, weights)[0]
+            lines.append(f"    {rng.choice(ATTRIBUTE_LINES[form])}\n    internal class Patch{rng.randrange(10 ** 6)} {{ }}\n")
+    lines.append("    public class Component {\n        void Update() {\n")
+    written = sum(map(len, lines))
+    while written < size:
+        lines.append(FILLER_LINE)
+        written += len(FILLER_LINE)
+    lines.append("        }\n    }\n}\n")
+    return "".join(lines).encode('utf-8')
+
+def generate_blob_corpus(files, seed=0, **kwargs):
+    rng = random.Random(seed)
+    blobs = []
+    for _ in range(files):
+        data = generate_cs_source(rng, **kwargs)
+        blobs.append((git_blob_sha(data), data))
+    return blobs
+
+def run_git(repo_dir, *args):
+    env = {**os.environ, "GIT_AUTHOR_NAME": "bench", "GIT_AUTHOR_EMAIL": "bench@localhost",
+           "GIT_COMMITTER_NAME": "bench", "GIT_COMMITTER_EMAIL": "bench@localhost"}
+    subprocess.run(["git", "-C", str(repo_dir), *args], check=True, capture_output=True, env=env)
+
+def generate_repo_corpus(root, repos, files_per_repo, assets_per_repo=5, asset_bytes=256 * 1024, seed=0, **kwargs):
+    """
+    Creates repos local git repositories under root, each with files_per_repo
+    .cs files and assets_per_repo binary assets. Returns the repo directories.
+    """
+    rng = random.Random(seed)
+    repo_dirs = []
+    for r in range(repos):
+        repo_dir = Path(root) / f"SyntheticMod{r:03d}"
+        for f in range(files_per_repo):
+            path = repo_dir / "src" / f"Dir{f % 8}" / f"File{f:04d}.cs"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(generate_cs_source(rng, **kwargs))
+        for a in range(assets_per_repo):
+            path = repo_dir / "assets" / f"texture{a}.bin"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(rng.randbytes(asset_bytes))
+        run_git(repo_dir, "init", "-q", "-b", "main")
+        # Allow blob-filtered partial clones and fetching single blobs, like GitHub does
+        run_git(repo_dir, "config", "uploadpack.allowFilter", "true")
+        run_git(repo_dir, "config", "uploadpack.allowAnySHA1InWant", "true")
+        run_git(repo_dir, "add", "-A")
+        run_git(repo_dir, "commit", "-q", "-m", "Synthetic mod")
+        repo_dirs.append(repo_dir)
+    return repo_dirs
+
+def write_site_fixture(www_dir, repo_dirs, base_url, lists=2):
+    """Writes SiteData.json and mod lists in the tldmods.com format pointing at the local repos."""
+    www_dir = Path(www_dir)
+    www_dir.mkdir(parents=True, exist_ok=True)
+    list_urls = []
+    for i in range(lists):
+        mods = [
+            {"type": "mod", "name": repo_dir.name, "version": "1.0.0", "author": "bench",
+             "modURL": repo_dir.resolve().as_uri()}
+            for repo_dir in repo_dirs[i::lists]
+        ]
+        (www_dir / f"ModList{i}.json").write_text(json.dumps({"version": "1", "mods": mods}), encoding='utf-8')
+        list_urls.append(f"{base_url}/ModList{i}.json")
+    (www_dir / "SiteData.json").write_text(json.dumps({"lists": list_urls, "oldlists": []}), encoding='utf-8')
+    return f"{base_url}/SiteData.json", list_urls
+
+@contextlib.contextmanager
+def serve_directory(directory):
+    """Local HTTP server for the fixtures; yields its base URL."""
+    handler = partial(QuietHandler, directory=str(directory))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+# === BENCHMARKS ===
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+def bench_extraction_scaling(blobs, max_workers):
+    """Extraction throughput through ExtractionPool for 1..max_workers processes."""
+    total_bytes = sum(len(data) for _, data in blobs)
+    results = []
+    for workers in range(1, max_workers + 1):
+        pool = ExtractionPool(workers)
+        # Warm the workers up so process start-up is not counted
+        for future in [pool.submit(batch) for batch in iter_batches(blobs[:workers])]:
+            future.result()
+
+        start = time.perf_counter()
+        futures = [pool.submit(batch) for batch in iter_batches(blobs)]
+        patches = sum(len(p or []) for future in futures for _, p, _ in future.result())
+        elapsed = time.perf_counter() - start
+        pool.shutdown()
+
+        results.append({
+            "workers": workers,
+            "seconds": elapsed,
+            "mb_per_s": total_bytes / elapsed / (1024 * 1024),
+            "patches": patches,
+        })
+    return results
+
+def bench_stages(work_dir, site_data_url, label, **settings):
+    """
+    Per-stage timings of a real Crawler.run() in work_dir, read from its
+    metrics file: clone, walk, prefetch, read and extract summed over every
+    repo job (so with several I/O threads they add up to more than the wall
+    time), plus the whole crawl. Caches stay in work_dir, so a later forced
+    run over invalidated mods measures the warm path.
+    """
+    run = bench_crawl(work_dir, site_data_url, label, metrics_file="metrics.jsonl", **settings)
+    with open(os.path.join(work_dir, "metrics.jsonl"), encoding='utf-8') as f:
+        summary = [json.loads(line) for line in f][-1]
+    stages = {name: timing["sum"] for name, timing in summary["seconds"].items() if name not in ("queue_wait", "total")}
+    stages["crawl"] = run["seconds"]
+    return {"label": label, "stages": stages, "mods": summary["mods"],
+            "bytes_scanned": summary["totals"].get("bytes_read", 0),
+            "cached_files": summary["totals"].get("cached_files", 0)}
+
+def bench_crawl(work_dir, site_data_url, label, **settings):
+    """End-to-end Crawler.run() in work_dir, with settings overriding Config fields."""
+    config = Config(site_data_url=site_data_url, allow_local_repos=True, **settings)
+    cwd = os.getcwd()
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        os.chdir(work_dir)
+        with contextlib.redirect_stdout(io.StringIO()):
+            seconds, _ = timed(Crawler(config).run)
+    finally:
+        os.chdir(cwd)
+    return {"label": label, "seconds": seconds}
+
+def bench_startup(runs=5):
+    """
+    Fresh-interpreter time to import the extractor alone and the whole
+    crawler, best of runs, plus which heavy modules the extractor pulled in.
+    """
+    probe = (
+        "import sys, time; start = time.perf_counter(); import {module}; "
+        "print(time.perf_counter() - start); print(','.join(m for m in ('requests', 'git', 'sqlite3') if m in sys.modules))"
+    )
+    results = {}
+    for label, module in [("extractor", "tldcompat"), ("crawler", "tldcompat.crawler")]:
+        best, heavy = None, None
+        for _ in range(runs):
+            output = subprocess.run([sys.executable, "-c", probe.format(module=module)], cwd=Path(__file__).parent,
+                                    check=True, capture_output=True, text=True).stdout.splitlines()
+            seconds = float(output[0])
+            best = seconds if best is None else min(best, seconds)
+            heavy = output[1] if len(output) > 1 else ""
+        results[label] = {"seconds": best, "heavy_modules": [m for m in heavy.split(',') if m]}
+    return results
+
+@contextlib.contextmanager
+def simulated_latency(repo_urls, mean_seconds, failure_rate=0.0, seed=0):
+    """
+    Adds a per-repo transfer delay to every mirror update, long-tailed around
+    mean_seconds with the slowest repo last in the lists. With failure_rate
+    that share of transfers fails like a throttled host, through the same
+    retry and backoff path as real git errors.
+    """
+    rng = random.Random(seed)
+    delays = {normalize_repo_url(url): rng.expovariate(1 / mean_seconds) for url in repo_urls}
+    delays[normalize_repo_url(repo_urls[-1])] = max(delays.values()) * 3
+    failures = random.Random(seed + 1)
+    lock = threading.Lock()
+    ensure = MirrorStore.ensure
+
+    def transfer(repo_url):
+        time.sleep(delays.get(normalize_repo_url(repo_url), 0))
+        with lock:
+            failed = failures.random() < failure_rate
+        if failed:
+            raise RuntimeError("The requested URL returned error: 429 (simulated)")
+
+    def slow_ensure(store, repo_url):
+        store.remotes.with_retries(repo_url, "Simulated transfer", partial(transfer, repo_url))
+        return ensure(store, repo_url)
+
+    MirrorStore.ensure = slow_ensure
+    try:
+        yield delays
+    finally:
+        MirrorStore.ensure = ensure
+
+def invalidate_mods(work_dir, keep_costs=True):
+    """
+    Marks every cached mod as changed so the next crawl rescans all repos.
+    Without keep_costs it also has no history and dispatches in list order.
+    """
+    path = os.path.join(work_dir, Config.mod_cache_file)
+    mod_cache = load_json_file(path, {})
+    for entry in mod_cache.values():
+        entry.pop("commit", None)
+        entry["version"] = None
+        if not keep_costs:
+            entry.pop("cost", None)
+    save_json_file(path, mod_cache)
+
+def bench_scheduling(work_dir, site_data_url, repo_urls, workers, mean_seconds):
+    """
+    Forced crawls under simulated latency: list order against longest-first
+    dispatch at a fixed worker count, then adaptive concurrency with and
+    without simulated throttling.
+    """
+    settings = {"force_refresh": True, "io_workers": workers, "retry_backoff_seconds": 0.2}
+    runs = []
+    with simulated_latency(repo_urls, mean_seconds) as delays:
+        bench_crawl(work_dir, site_data_url, "cold", **settings)  # Clones and records costs
+        invalidate_mods(work_dir, keep_costs=False)
+        runs.append(bench_crawl(work_dir, site_data_url, "list_order", adaptive_concurrency=False, **settings))
+        invalidate_mods(work_dir)
+        runs.append(bench_crawl(work_dir, site_data_url, "longest_first", adaptive_concurrency=False, **settings))
+        invalidate_mods(work_dir)
+        runs.append(bench_crawl(work_dir, site_data_url, "adaptive", adaptive_concurrency=True, **settings))
+    with simulated_latency(repo_urls, mean_seconds, failure_rate=0.2):
+        invalidate_mods(work_dir)
+        runs.append(bench_crawl(work_dir, site_data_url, "adaptive_throttled", adaptive_concurrency=True, **settings))
+    # No schedule can beat the slowest repo or the total delay spread over all workers
+    lower_bound = max(sum(delays.values()) / workers, max(delays.values()))
+    return {"workers": workers, "lower_bound": lower_bound, "runs": runs}
+
+def current_commit():
+    try:
+        return subprocess.run(["git", "-C", str(Path(__file__).parent), "rev-parse", "HEAD"],
+                              check=True, capture_output=True, text=True).stdout.strip()
+    except Exception:
+        return None
+
+def compare_results(old, new):
+    """Prints per-stage changes between two result files."""
+    def flatten(results):
+        flat = {}
+        for run in results.get("stages", []):
+            for stage, seconds in run["stages"].items():
+                flat[f"{run['label']}.{stage}"] = seconds
+        for run in results.get("crawls", []):
+            flat[f"crawl.{run['label']}"] = run["seconds"]
+        for run in results.get("scheduling", {}).get("runs", []):
+            flat[f"scheduling.{run['label']}"] = run["seconds"]
+        for label, run in results.get("startup", {}).items():
+            flat[f"startup.{label}"] = run["seconds"]
+        return flat
+
+    old_flat, new_flat = flatten(old), flatten(new)
+    print(f"\n📊 Compared with {old.get('commit') or 'baseline'}:")
+    for key, seconds in new_flat.items():
+        if key in old_flat and old_flat[key] > 0:
+            change = (seconds - old_flat[key]) / old_flat[key] * 100
+            marker = "🔺" if change > 10 else "🔻" if change < -10 else "  "
+            print(f"{marker} {key:<28} {old_flat[key] * 1000:9.1f} ms -> {seconds * 1000:9.1f} ms ({change:+.0f}%)")
+
+def parse_attribute_mix(text):
+    mix = {}
+    for part in text.split(','):
+        form, _, weight = part.partition('=')
+        if form not in ATTRIBUTE_LINES:
+            raise argparse.ArgumentTypeError(f"unknown attribute form {form!r}, expected one of {', '.join(ATTRIBUTE_LINES)}")
+        mix[form] = float(weight or 1)
+    return mix
+
+# === ENTRY POINT ===
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks for the tldcompat crawler on a synthetic mod corpus.")
+    parser.add_argument("--repos", type=int, default=20, help="Synthetic mod repositories")
+    parser.add_argument("--files", type=int, default=50, help=".cs files per repository")
+    parser.add_argument("--assets", type=int, default=5, help="Binary assets per repository")
+    parser.add_argument("--asset-kb", type=int, default=256, help="Size of each asset")
+    parser.add_argument("--mean-file-kb", type=float, default=8, help="Mean .cs file size")
+    parser.add_argument("--size-distribution", choices=["exp", "lognormal", "fixed"], default="exp")
+    parser.add_argument("--patched-ratio", type=float, default=0.3, help="Share of .cs files with Harmony attributes")
+    parser.add_argument("--attribute-mix", type=parse_attribute_mix, default=None,
+                        help="Weights of the attribute forms, e.g. string=1,nameof=2,typeof=4")
+    parser.add_argument("--lists", type=int, default=2, help="Mod lists the repos are spread over")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1, help="Largest extraction pool to measure")
+    parser.add_argument("--scaling-files", type=int, default=4000, help="In-memory files for the extraction scaling run")
+    parser.add_argument("--latency-ms", type=float, default=200,
+                        help="Mean simulated transfer time per repo for the scheduling runs, 0 to skip them")
+    parser.add_argument("--scheduling-workers", type=int, default=4, help="Repo jobs at once in the scheduling runs")
+    parser.add_argument("--output", type=str, default="bench_results.json", help="Where to write the results")
+    parser.add_argument("--compare", type=str, help="Earlier results file to compare against")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated corpus and caches")
+    args = parser.parse_args()
+
+    source_options = {
+        "patched_ratio": args.patched_ratio,
+        "mean_bytes": int(args.mean_file_kb * 1024),
+        "distribution": args.size_distribution,
+        "attribute_mix": args.attribute_mix,
+    }
+    root = Path(tempfile.mkdtemp(prefix="tld_bench_"))
+    results = {"commit": current_commit(), "timestamp": time.time(), "settings": vars(args).copy()}
+
+    results["startup"] = bench_startup()
+    print("⏱️ Import time:")
+    for label, run in results["startup"].items():
+        heavy = f" (loads {', '.join(run['heavy_modules'])})" if run["heavy_modules"] else ""
+        print(f"   {label:<12} {run['seconds'] * 1000:9.1f} ms{heavy}")
+
+    try:
+        print(f"🏗️ Generating {args.repos} repos x {args.files} .cs files in {root}")
+        repo_dirs = generate_repo_corpus(root / "repos", args.repos, args.files, args.assets,
+                                         args.asset_kb * 1024, **source_options)
+        repo_urls = [repo_dir.resolve().as_uri() for repo_dir in repo_dirs]
+
+        with serve_directory(root / "www") as base_url:
+            site_data_url, list_urls = write_site_fixture(root / "www", repo_dirs, base_url, args.lists)
+
+            stages_dir = str(root / "stages")
+            results["stages"] = [bench_stages(stages_dir, site_data_url, "cold")]
+            invalidate_mods(stages_dir)
+            results["stages"].append(bench_stages(stages_dir, site_data_url, "warm", force_refresh=True))
+            for run in results["stages"]:
+                megabytes = run["bytes_scanned"] / (1024 * 1024)
+                print(f"\n⏱️ {run['label']} stages ({megabytes:.1f} MB of C# read, {run['cached_files']} files from the blob cache, "
+                      f"summed over {run['mods']} repo jobs):")
+                for stage, seconds in run["stages"].items():
+                    print(f"   {stage:<12} {seconds * 1000:9.1f} ms")
+
+            crawl_dir = str(root / "crawl")
+            results["crawls"] = [
+                bench_crawl(crawl_dir, site_data_url, "cold"),
+                bench_crawl(crawl_dir, site_data_url, "warm_unchanged"),
+                bench_crawl(crawl_dir, site_data_url, "warm_forced", force_refresh=True),
+            ]
+            print("\n⏱️ Full crawl:")
+            for run in results["crawls"]:
+                print(f"   {run['label']:<16} {run['seconds'] * 1000:9.1f} ms")
+
+            if args.latency_ms:
+                results["scheduling"] = bench_scheduling(str(root / "scheduling"), site_data_url, repo_urls,
+                                                         args.scheduling_workers, args.latency_ms / 1000)
+                print(f"\n⏱️ Scheduling with simulated latency ({args.scheduling_workers} workers, "
+                      f"lower bound {results['scheduling']['lower_bound'] * 1000:.1f} ms):")
+                for run in results["scheduling"]["runs"]:
+                    print(f"   {run['label']:<20} {run['seconds'] * 1000:9.1f} ms")
+
+        blobs = generate_blob_corpus(args.scaling_files, **source_options)
+        results["extraction_scaling"] = bench_extraction_scaling(blobs, args.max_workers)
+        print(f"\n⏱️ Extraction scaling ({sum(len(d) for _, d in blobs) / (1024 * 1024):.1f} MB in memory):")
+        baseline = results["extraction_scaling"][0]["seconds"]
+        for result in results["extraction_scaling"]:
+            print(f"   {result['workers']:>2} workers: {result['mb_per_s']:8.1f} MB/s ({baseline / result['seconds']:.2f}x)")
+    finally:
+        if not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
+
+    save_json_file(args.output, results)
+    print(f"\n💾 Results saved to {args.output}")
+
+    if args.compare:
+        compare_results(load_json_file(args.compare, {}), results)
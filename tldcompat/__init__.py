@@ -0,0 +1,74 @@
+"""
+Harmony patch scanner for The Long Dark mods.
+
+The extractor is imported eagerly and needs nothing beyond `re`:
+
+    from tldcompat import extract_harmony_patches_from_code
+
+Everything else (HTTP, git, storage, the crawler) loads on first use, so
+importing the package stays cheap for tools that only parse C#:
+
+    from tldcompat import Config, Crawler
+    Crawler(Config(site_data_url="https://...")).run()
+"""
+import importlib
+
+from .extract import (EXTRACTOR_VERSION, HARMONY_ATTRIBUTE_PATTERN, classify_harmony_attribute,
+                      extract_harmony_patches_from_bytes, extract_harmony_patches_from_chunks,
+                      extract_harmony_patches_from_code, normalize_patch_target)
+
+# name -> submodule, imported when the name is first looked up
+_LAZY = {
+    "Config": "config",
+    "extract_harmony_patches_from_file": "scan",
+    "extract_patches_from_directory": "scan",
+    "load_json_file": "util",
+    "save_json_file": "util",
+    "normalize_repo_url": "util",
+    "HttpFetcher": "fetch",
+    "fetch_json": "fetch",
+    "BlobScanCache": "cache",
+    "git_blob_sha": "cache",
+    "HostRateLimiter": "repos",
+    "GitRemotes": "repos",
+    "MirrorStore": "repos",
+    "ExtractionPool": "pool",
+    "PatchIndex": "index",
+    "ConflictIndex": "index",
+    "write_lookup_index": "index",
+    "JsonStorage": "storage",
+    "SqliteStorage": "storage",
+    "ResultJournal": "storage",
+    "open_storage": "storage",
+    "MetricsRecorder": "metrics",
+    "run_profiled": "metrics",
+    "PatchHistory": "history",
+    "check_local_source": "check",
+    "Crawler": "crawler",
+    "RepoScheduler": "crawler",
+    "parse_mod_list": "crawler",
+    "get_mods_from_list_url": "crawler",
+    "main": "cli",
+}
+
+__all__ = [
+    "EXTRACTOR_VERSION",
+    "HARMONY_ATTRIBUTE_PATTERN",
+    "classify_harmony_attribute",
+    "extract_harmony_patches_from_bytes",
+    "extract_harmony_patches_from_chunks",
+    "extract_harmony_patches_from_code",
+    "normalize_patch_target",
+    *_LAZY,
+]
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
@@ -0,0 +1,63 @@
+"""
+Patches per .cs blob hash, shared by every mod and invalidated when the extractor changes.
+"""
+import hashlib
+import threading
+
+from .config import Config
+from .extract import EXTRACTOR_VERSION, HARMONY_ATTRIBUTE_PATTERN
+from .util import load_json_file, save_json_file
+
+def extractor_fingerprint():
+    pattern_hash = hashlib.sha1(HARMONY_ATTRIBUTE_PATTERN.pattern.encode('utf-8')).hexdigest()[:12]
+    return f"{EXTRACTOR_VERSION}:{pattern_hash}"
+
+def git_blob_sha(data):
+    """The hash git would give data as a blob, for files read from a working tree."""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+class BlobScanCache:
+    """
+    Persistent map of git blob hash -> patches extracted from that blob, so a
+    rescan only parses file contents it has never seen before.
+    The whole cache is dropped when the extractor fingerprint changes. Above
+    max_entries the entries unused for the most runs are evicted on save.
+    """
+
+    def __init__(self, path=Config.blob_cache_file, max_entries=Config.blob_cache_max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        data = load_json_file(path, {})
+        if data.get("extractor") != extractor_fingerprint():
+            data = {}
+        # Each run is one generation; entries remember the last one that used them
+        self.generation = data.get("generation", 0) + 1
+        self.entries = data.get("entries", {})  # blob_sha -> [generation, patches]
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, blob_sha):
+        with self._lock:
+            entry = self.entries.get(blob_sha)
+            if entry is None:
+                self.misses += 1
+                return None
+            entry[0] = self.generation
+            self.hits += 1
+            return entry[1]
+
+    def put(self, blob_sha, patches):
+        with self._lock:
+            self.entries[blob_sha] = [self.generation, list(patches)]
+
+    def save(self):
+        with self._lock:
+            if len(self.entries) > self.max_entries:
+                keep = sorted(self.entries.items(), key=lambda item: item[1][0], reverse=True)[:self.max_entries]
+                self.entries = dict(keep)
+            save_json_file(self.path, {
+                "extractor": extractor_fingerprint(),
+                "generation": self.generation,
+                "entries": self.entries,
+            })
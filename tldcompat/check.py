@@ -0,0 +1,25 @@
+"""
+Conflict check of a local mod's source against the published mods.
+"""
+from .config import Config
+from .index import ConflictIndex
+from .scan import extract_patches_from_directory
+
+def check_local_source(source_dir, index=None, exclude_mods=(), index_path=Config.lookup_index_file,
+                       max_bytes=Config.max_scan_file_bytes, policy=Config.oversize_policy):
+    """
+    Which published mods patch the same methods or classes as the mod in
+    source_dir? index is a ConflictIndex, loaded from index_path by default.
+    Returns: {local_patch: {"exact": [mods], "related": {published_patch: [mods]}, "files": [paths]}}
+    with only the patches that overlap something.
+    """
+    if index is None:
+        index = ConflictIndex.load(index_path)
+    exclude = set(exclude_mods)
+
+    conflicts = {}
+    for patch, files in sorted(extract_patches_from_directory(source_dir, max_bytes, policy).items()):
+        found = index.lookup(patch, exclude)
+        if found["exact"] or found["related"]:
+            conflicts[patch] = {**found, "files": files}
+    return conflicts
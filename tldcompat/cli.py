@@ -0,0 +1,271 @@
+"""
+Command line: crawl, `check` and `history`. checker.py runs main().
+"""
+import argparse
+import json
+import os
+import time
+
+from .config import Config
+
+def run_check(source_dir, index_path, exclude_mods, as_json, patch_map_path=Config.patch_map_file):
+    from .check import check_local_source
+    from .index import ConflictIndex, PatchIndex
+    from .util import load_json_file
+
+    start = time.perf_counter()
+    if os.path.exists(index_path):
+        index = ConflictIndex.load(index_path)
+    elif os.path.exists(patch_map_path):
+        # Crawls from before the lookup index existed
+        index = ConflictIndex.from_patch_index(PatchIndex.from_patch_map(load_json_file(patch_map_path, {})))
+    else:
+        print(f"❌ Error: neither {index_path} nor {patch_map_path} exists, run a crawl first.")
+        return 1
+
+    conflicts = check_local_source(source_dir, index, exclude_mods)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    if as_json:
+        print(json.dumps(conflicts, indent=2))
+        return 0
+
+    for patch, found in conflicts.items():
+        if found["exact"]:
+            print(f"⚠️ {patch} is also patched by: {', '.join(found['exact'])}")
+        else:
+            print(f"⚠️ {patch} overlaps class-level patches:")
+        for related_patch, mods in found["related"].items():
+            print(f"   ↳ {related_patch}: {', '.join(mods)}")
+        print(f"   in {', '.join(found['files'])}")
+
+    if not conflicts:
+        print("✅ No published mod patches the same methods or classes.")
+    print(f"\n🔍 Checked {source_dir} in {elapsed_ms:.0f} ms")
+    return 0
+
+def run_history_query(patch, mod_names, history_path, as_json):
+    from .history import PatchHistory
+
+    if not os.path.exists(history_path):
+        print(f"❌ Error: {history_path} does not exist, run a crawl with --history first.")
+        return 1
+
+    events = PatchHistory.load(history_path).timeline(patch, set(mod_names))
+    if as_json:
+        print(json.dumps(events, indent=2))
+        return 0
+
+    for event in events:
+        day = time.strftime("%Y-%m-%d", time.gmtime(event["date"]))
+        verb = "started" if event["change"] == "added" else "stopped"
+        print(f"{'🟢' if event['change'] == 'added' else '🔴'} {day} {event['mod']} {event['version']} ({event['commit'][:10]}) {verb} patching {patch}")
+    if not events:
+        print(f"✅ No version of {', '.join(mod_names) if mod_names else 'any mod'} ever patched {patch}.")
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Harmony patch scanner.")
+    parser.add_argument(
+        "--site-data-url",
+        type=str,
+        help="URL to the SiteData.json file (required unless only exporting)"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=Config.mirror_cache_dir,
+        help=f"Directory for the persistent repo mirrors (default: {Config.mirror_cache_dir})"
+    )
+    parser.add_argument(
+        "--mirror-cache-max-mb",
+        type=int,
+        default=Config.mirror_cache_max_bytes // (1024 * 1024),
+        help="Size above which mirrors of mods no longer in any list are evicted"
+    )
+    parser.add_argument(
+        "--db",
+        type=str,
+        help="Keep results in this SQLite database, committing each mod as soon as it finishes"
+    )
+    parser.add_argument(
+        "--export-json",
+        action="store_true",
+        help=f"Write {Config.patch_map_file} and {Config.mod_cache_file} from the --db database (after the crawl, if one is run)"
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help=f"Continue an interrupted crawl from {Config.journal_file} instead of starting over"
+    )
+    parser.add_argument(
+        "--metrics",
+        type=str,
+        help="Record per-mod stage timings and counters to this file"
+    )
+    parser.add_argument(
+        "--metrics-format",
+        choices=["jsonl", "chrome"],
+        default=Config.metrics_format,
+        help="JSON lines, or a Chrome trace for chrome://tracing / Perfetto (default: jsonl)"
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        help="Run the crawl under cProfile and write the report to this file"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Check every repo even if the site data and mod lists are unchanged since the last run"
+    )
+    parser.add_argument(
+        "--io-workers",
+        type=int,
+        default=Config.io_workers,
+        help=f"Threads fetching mirrors and reading blobs, the most repos scanned at once (default: {Config.io_workers})"
+    )
+    parser.add_argument(
+        "--fixed-workers",
+        action="store_true",
+        help="Always run --io-workers repo jobs at once instead of adapting to throughput and host backoffs"
+    )
+    parser.add_argument(
+        "--host-rate",
+        type=float,
+        default=Config.host_rate_limit,
+        help=f"Git network operations per second per host, 0 for no limit (default: {Config.host_rate_limit})"
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=Config.git_retries,
+        help=f"Retries of a git network operation after a transient failure (default: {Config.git_retries})"
+    )
+    parser.add_argument(
+        "--cpu-workers",
+        type=int,
+        default=Config.cpu_workers,
+        help="Processes extracting patches, 0 to extract on the I/O threads (default: one per core)"
+    )
+    parser.add_argument(
+        "--scan-mode",
+        choices=["odb", "checkout"],
+        default=Config.scan_mode,
+        help="Read .cs files straight from the git object database (default) or from a checkout"
+    )
+    parser.add_argument(
+        "--max-file-mb",
+        type=float,
+        default=Config.max_scan_file_bytes / (1024 * 1024),
+        help="Size above which .cs files are handled by --oversize-policy"
+    )
+    parser.add_argument(
+        "--oversize-policy",
+        choices=["stream", "head", "skip"],
+        default=Config.oversize_policy,
+        help="Scan oversized files in chunks (default), only their first --max-file-mb, or not at all"
+    )
+    parser.add_argument(
+        "--full-mirrors",
+        action="store_true",
+        help="Clone complete mirrors instead of blob-filtered partial clones"
+    )
+    parser.add_argument(
+        "--history",
+        action="store_true",
+        help=f"Scan every tagged version of every mod, oldlists included, into {Config.history_file} instead of a normal crawl"
+    )
+
+    subparsers = parser.add_subparsers(dest="command")
+    check_parser = subparsers.add_parser(
+        "check",
+        help="List published mods that patch the same methods or classes as a local mod"
+    )
+    check_parser.add_argument("source", type=str, help="Local mod checkout to scan")
+    check_parser.add_argument(
+        "--index",
+        type=str,
+        default=Config.lookup_index_file,
+        help=f"Lookup index written by the last crawl (default: {Config.lookup_index_file})"
+    )
+    check_parser.add_argument(
+        "--exclude-mod",
+        action="append",
+        default=[],
+        help="Ignore this published mod, e.g. an older release of your own (repeatable)"
+    )
+    check_parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+    history_parser = subparsers.add_parser(
+        "history",
+        help="Show when mods started or stopped patching a method, from a --history crawl"
+    )
+    history_parser.add_argument("patch", type=str, help='Patch target, e.g. "Panel_Map.Enable"')
+    history_parser.add_argument("--mod", action="append", default=[], help="Only this mod (repeatable)")
+    history_parser.add_argument(
+        "--history-file",
+        type=str,
+        default=Config.history_file,
+        help=f"History written by a --history crawl (default: {Config.history_file})"
+    )
+    history_parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+    return parser
+
+def config_from_args(args):
+    return Config(
+        site_data_url=(args.site_data_url or "").strip(),
+        mirror_cache_dir=args.cache_dir,
+        mirror_cache_max_bytes=args.mirror_cache_max_mb * 1024 * 1024,
+        scan_mode=args.scan_mode,
+        max_scan_file_bytes=int(args.max_file_mb * 1024 * 1024),
+        oversize_policy=args.oversize_policy,
+        io_workers=args.io_workers,
+        adaptive_concurrency=not args.fixed_workers,
+        host_rate_limit=args.host_rate,
+        git_retries=args.retries,
+        cpu_workers=args.cpu_workers,
+        force_refresh=args.force,
+        storage_db_file=args.db,
+        resume=args.resume,
+        metrics_file=args.metrics,
+        metrics_format=args.metrics_format,
+        profile_file=args.profile,
+        mirror_blob_filter=None if args.full_mirrors else Config.mirror_blob_filter,
+    )
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.command == "check":
+        return run_check(args.source, args.index, args.exclude_mod, args.json)
+    if args.command == "history":
+        return run_history_query(args.patch, args.mod, args.history_file, args.json)
+    config = config_from_args(args)
+
+    if args.export_json and not config.storage_db_file:
+        print("❌ Error: --export-json needs --db.")
+        return 1
+
+    if not config.site_data_url and not args.export_json:
+        print("❌ Error: --site-data-url cannot be empty.")
+        return 1
+
+    if config.site_data_url:
+        from .crawler import Crawler
+        from .metrics import run_profiled
+
+        crawler = Crawler(config)
+        crawl = crawler.run_history if args.history else crawler.run
+        if config.profile_file:
+            run_profiled(crawl, config.profile_file)
+        else:
+            crawl()
+
+    if args.export_json:
+        from .storage import open_storage
+
+        storage = open_storage(config)
+        storage.export_json(config.patch_map_file, config.mod_cache_file)
+        storage.close()
+        print(f"💾 Exported {config.storage_db_file} to {config.patch_map_file} and {config.mod_cache_file}")
+    return 0
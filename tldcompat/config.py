@@ -0,0 +1,52 @@
+"""
+Settings of a crawl. The CLI builds one from its arguments; library users
+construct their own and hand it to Crawler, e.g. Config(site_data_url=...,
+io_workers=4).
+"""
+import os
+from dataclasses import dataclass
+
+from .scan import MAX_SCAN_FILE_BYTES, OVERSIZE_POLICY, SCAN_CHUNK_BYTES
+
+@dataclass
+class Config:
+    site_data_url: str = ""
+    patch_map_file: str = "patch_map.json"
+    mod_cache_file: str = "mod_cache.json"
+    oldlists_cache_file: str = "oldlists_cache.json"
+    http_cache_file: str = "http_cache.json"  # Last body, ETag and Last-Modified of every fetched list
+    http_timeout: tuple = (10, 60)  # Connect and read timeouts in seconds
+    http_pool_size: int = 16  # Pooled connections per host
+    force_refresh: bool = False  # Ignore the HTTP cache and check every repo even if no list changed
+    storage_db_file: str = None  # SQLite database to keep results in instead of patch_map.json / mod_cache.json
+    journal_file: str = "crawl_journal.jsonl"  # Append-only log of finished mods, removed after a complete run
+    journal_fsync_every: int = 16  # Records between fsyncs of the journal
+    journal_fsync_seconds: float = 5.0  # ...or seconds, whichever comes first
+    resume: bool = False  # Replay the journal of an interrupted run and only scan what it had not finished
+    allow_local_repos: bool = False  # Also accept file:// mod URLs (local fixtures and benchmarks)
+    lookup_index_file: str = "patch_lookup.json"  # Compact patch -> mods index written after every crawl for `check`
+    metrics_file: str = None  # Per-mod timings and counters are recorded only when this is set
+    metrics_format: str = "jsonl"  # "jsonl" (one line per mod plus a run summary) or "chrome" (chrome://tracing / Perfetto)
+    profile_file: str = None  # cProfile report of the whole crawl, all threads
+    io_workers: int = 8  # Threads for fetching mirrors and reading blobs; the most repo jobs run at once
+    adaptive_concurrency: bool = True  # Start at half of io_workers and tune from throughput and host backoffs
+    host_rate_limit: float = 20.0  # Git network operations (ls-remote, clone, fetch) per second per host; 0 disables
+    host_rate_burst: int = 40
+    git_retries: int = 3  # Extra attempts for a git network operation that failed with a transient error
+    retry_backoff_seconds: float = 1.0  # Base of the exponential backoff, randomized with full jitter
+    cost_smoothing: float = 0.5  # Weight of the latest run in the per-mod cost average
+    cpu_workers: int = os.cpu_count() or 1  # Processes running the extractor; 0 extracts on the I/O threads
+    extract_batch_bytes: int = 1024 * 1024  # Source bytes per task sent to the extraction processes
+    mirror_cache_dir: str = "mirror_cache"  # Persistent bare mirrors, one per remote
+    mirror_cache_max_bytes: int = 2 * 1024 ** 3  # Mirrors of delisted mods are evicted above this size
+    mirror_index_file: str = "mirrors.json"
+    mirror_blob_filter: str = "blob:none"  # Partial-clone filter for new mirrors; .cs blobs are fetched on demand
+    scan_mode: str = "odb"  # "odb" streams .cs blobs out of the mirror, "checkout" scans a working tree
+    blob_cache_file: str = "blob_cache.json"  # Patches per .cs blob hash, shared by every mod
+    blob_cache_max_entries: int = 250_000
+    history_file: str = "patch_history.json"  # Patches of every tagged version, written by --history
+    max_scan_file_bytes: int = MAX_SCAN_FILE_BYTES  # Larger .cs files (decompiled/generated code) follow oversize_policy
+    oversize_policy: str = OVERSIZE_POLICY  # "stream" scans them in chunks, "head" only the first max_scan_file_bytes, "skip" ignores them
+    scan_chunk_bytes: int = SCAN_CHUNK_BYTES
+    remote_lookup_workers: int = 16  # Concurrent `git ls-remote` calls in the change-detection pre-pass
+    remote_lookup_timeout: int = 60  # Seconds
@@ -0,0 +1,731 @@
+"""
+The crawl itself: which repos to scan, in what order, and how their
+patches are attributed to the mods of every list.
+"""
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from git import Repo
+
+from .cache import BlobScanCache, extractor_fingerprint, git_blob_sha
+from .config import Config
+from .extract import extract_harmony_patches_from_chunks
+from .fetch import HttpFetcher, fetch_json
+from .history import PatchHistory
+from .index import write_lookup_index
+from .metrics import NULL_MOD_METRICS, MetricsRecorder, ReadTally
+from .pool import ExtractionPool, iter_batches
+from .repos import MirrorStore, blob_sizes, is_permanent_git_error, diff_cs_blobs, iter_blob_chunks, iter_blob_data, list_cs_blobs, list_versions
+from .scan import iter_file_chunks, oversize_limit
+from .storage import ResultJournal, open_storage
+from .util import normalize_repo_url, save_json_file
+
+def expected_cost(cache_entry):
+    """Seconds the last runs of a mod took on average; None when it was never timed."""
+    cost = (cache_entry or {}).get("cost")
+    return cost.get("seconds") if cost else None
+
+def update_cost(previous_entry, seconds, size, smoothing=Config.cost_smoothing):
+    """Moving average of a mod's scan time, plus its mirror size, for the mod cache."""
+    previous = expected_cost(previous_entry)
+    if previous is not None:
+        seconds = smoothing * seconds + (1 - smoothing) * previous
+    return {"seconds": round(seconds, 3), "bytes": size}
+
+class RepoScheduler:
+    """
+    Runs process_repo jobs on up to max_workers threads, always starting the
+    pending job with the highest expected cost (never timed counts as highest),
+    so one huge repo no longer finishes long after everything else.
+
+    With adaptive on, only limit jobs run at once (AIMD): after every window
+    of limit finished jobs it grows by one while throughput (.cs bytes read
+    per second, the "bytes_read" of each result) holds
+    up and shrinks by one when it drops; a failed job or a host backoff halves it.
+    Jobs whose repo is gone ("unavailable") say nothing about load and are ignored.
+    Backoffs are read from limiter, a HostRateLimiter.
+    """
+
+    def __init__(self, max_workers, adaptive=Config.adaptive_concurrency, limiter=None,
+                 backoff_seconds=Config.retry_backoff_seconds):
+        self.max_workers = max(max_workers, 1)
+        self.adaptive = adaptive
+        self.limiter = limiter
+        self.backoff_seconds = backoff_seconds
+        self.limit = max(self.max_workers // 2, 1) if adaptive else self.max_workers
+        self.peak_limit = self.limit
+        self.peak_running = 0
+        self._pending = []  # heap of (-cost, sequence, future, fn, args)
+        self._sequence = itertools.count()
+        self._running = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._window_bytes = 0
+        self._window_jobs = 0
+        self._window_started = time.perf_counter()
+        self._last_throughput = None
+        self._last_decrease = 0.0
+        self._seen_backoffs = self._backoffs()
+        self._threads = [threading.Thread(target=self._work, daemon=True) for _ in range(self.max_workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    def submit(self, cost, fn, *args):
+        future = Future()
+        with self._condition:
+            priority = -cost if cost is not None else float("-inf")
+            heapq.heappush(self._pending, (priority, next(self._sequence), future, fn, args))
+            self._condition.notify()
+        return future
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not (self._closed and not self._pending) and (not self._pending or self._running >= self.limit):
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                _, _, future, fn, args = heapq.heappop(self._pending)
+                self._running += 1
+                self.peak_running = max(self.peak_running, self._running)
+
+            result = None
+            if future.set_running_or_notify_cancel():
+                try:
+                    result = fn(*args)
+                    future.set_result(result)
+                except BaseException as e:
+                    future.set_exception(e)
+
+            with self._condition:
+                self._running -= 1
+                if self.adaptive:
+                    data, status = result if isinstance(result, tuple) else (None, "error")
+                    if status != "unavailable":
+                        self._adapt((data or {}).get("bytes_read", 0), status != "error")
+                self._condition.notify_all()
+
+    def _backoffs(self):
+        return self.limiter.backoffs if self.limiter else 0
+
+    def _adapt(self, size, ok):
+        # Called with the condition held
+        backoffs = self._backoffs()
+        throttled = backoffs > self._seen_backoffs
+        self._seen_backoffs = backoffs
+        now = time.perf_counter()
+
+        if not ok or throttled:
+            # One halving per backoff period, however many jobs report the same trouble
+            if now - self._last_decrease >= self.backoff_seconds and self.limit > 1:
+                self.limit = max(self.limit // 2, 1)
+                print(f"🐢 Concurrency lowered to {self.limit} ({'host backoff' if throttled else 'failed repo'})")
+            self._last_decrease = now
+            self._reset_window(now)
+            return
+
+        self._window_bytes += size
+        self._window_jobs += 1
+        if self._window_jobs < self.limit:
+            return
+        elapsed = now - self._window_started
+        throughput = self._window_bytes / elapsed if elapsed > 0 else 0.0
+        if self._last_throughput is None or throughput >= 0.9 * self._last_throughput:
+            self.limit = min(self.limit + 1, self.max_workers)
+        else:
+            self.limit = max(self.limit - 1, 1)
+        self.peak_limit = max(self.peak_limit, self.limit)
+        self._last_throughput = throughput
+        self._reset_window(now)
+
+    def _reset_window(self, now):
+        self._window_bytes = 0
+        self._window_jobs = 0
+        self._window_started = now
+
+    def shutdown(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+def needs_scan(cache_entry, mod_version, remote_sha, mod_path=None):
+    """
+    The remote commit decides whether a mod changed. The version string is
+    only used when the commit could not be resolved or was never recorded.
+    A mod whose subdirectory hint changed is always rescanned. A mod whose repo
+    was gone or private is retried once its list entry or remote HEAD changes.
+    """
+    if not cache_entry or cache_entry.get("path") != mod_path:
+        return True
+    if cache_entry.get("unavailable"):
+        return cache_entry.get("commit") != remote_sha or cache_entry.get("version") != mod_version
+    if remote_sha and cache_entry.get("commit"):
+        return cache_entry["commit"] != remote_sha
+    return cache_entry.get("version") != mod_version
+
+def extract_blobs(blobs, paths, blob_cache, extraction_pool, metrics=NULL_MOD_METRICS,
+                  batch_bytes=Config.extract_batch_bytes):
+    """
+    Sends (blob_sha, bytes) pairs through extraction_pool and caches the results.
+    paths ({blob_sha: [paths]}) names the files in error messages.
+    Returns: {blob_sha: patches}
+    """
+    def counted():
+        for blob_sha, data in metrics.timed_iter("read", blobs):
+            metrics.count("bytes_read", len(data))
+            yield blob_sha, data
+
+    found = {}
+    futures = [extraction_pool.submit(batch) for batch in iter_batches(counted(), batch_bytes)]
+    for future in futures:
+        for blob_sha, patches, error in future.result():
+            if error is not None:
+                print(f"⚠️ Error reading {', '.join(map(str, paths[blob_sha]))}: {error}")
+                continue
+            blob_cache.put(blob_sha, patches)
+            found[blob_sha] = patches
+    return found
+
+def normalize_mod_path(mod_path):
+    """Repo-relative subdirectory hint of a list entry: "Mods/Foo/" -> "Mods/Foo", empty -> None."""
+    if not mod_path:
+        return None
+    return mod_path.replace('\\', '/').strip('/') or None
+
+def patches_under_path(result, mod_path):
+    """The patches process_repo found below mod_path, or in the whole repo when mod_path is None."""
+    if mod_path is None:
+        return result["patches"]
+    prefix = mod_path + '/'
+    return {patch for path, patches in result["patches_by_path"].items() if path.startswith(prefix) for patch in patches}
+
+def get_mods_from_list_url(json_url, allow_local_repos=Config.allow_local_repos):
+    return parse_mod_list(fetch_json(json_url), allow_local_repos)
+
+def parse_mod_list(data, allow_local_repos=Config.allow_local_repos):
+    """
+    Returns: [(repo_url, mod_name, mod_version, mod_path)] where mod_path is the
+    optional "modPath" subdirectory of a mod living in a shared repo.
+    """
+    mods = []
+    for mod in data.get("mods", []):
+        repo_url = mod.get("modURL")
+        mod_name = mod.get("name") or "UnknownMod"
+        mod_version = mod.get("version") or "0.0.0"
+        mod_path = normalize_mod_path(mod.get("modPath"))
+        if repo_url and ("github.com" in repo_url or (allow_local_repos and repo_url.startswith("file://"))):
+            mods.append((repo_url, mod_name, mod_version, mod_path))
+    return mods
+
+class Crawler:
+    """
+    A crawl over the lists of config.site_data_url. fetcher (an HttpFetcher)
+    and repos (a MirrorStore) are built from config unless passed in, so a
+    caller can point the crawler at its own HTTP cache or mirror store.
+    With cpu_workers > 0 extraction runs in spawned processes that import the
+    caller's __main__ again, so a script must start the crawl under
+    'if __name__ == "__main__":' (or set cpu_workers=0).
+    """
+
+    def __init__(self, config=None, fetcher=None, repos=None):
+        self.config = config or Config()
+        self.fetcher = fetcher or HttpFetcher(
+            self.config.http_cache_file, conditional=not self.config.force_refresh,
+            timeout=self.config.http_timeout, pool_size=self.config.http_pool_size
+        )
+        self.repos = repos or MirrorStore.from_config(self.config)
+        # Set up by run() and run_history()
+        self.blob_cache = None
+        self.extraction_pool = None
+
+    def run(self):
+        """
+        Crawls every list of config.site_data_url and saves the patches of every
+        mod whose repo changed since the last run.
+        """
+        config = self.config
+        storage = open_storage(config)
+        patch_index, mod_cache = storage.load()
+        fetcher = self.fetcher
+
+        finished_mods = set()
+        if config.resume:
+            for record in ResultJournal.replay(config.journal_file):
+                patch_index.replace_mod(record["mod"], record["patches"])
+                mod_cache[record["mod"]] = record["entry"]
+                storage.commit_mod(record["mod"], record["entry"], record["patches"])
+                finished_mods.add(record["mod"])
+            print(f"♻️ Resuming: {len(finished_mods)} mods already finished in {config.journal_file}")
+        elif os.path.exists(config.journal_file):
+            print(f"⚠️ Discarding {config.journal_file} from an interrupted run (use --resume to continue it)")
+        journal = ResultJournal(config.journal_file, config.journal_fsync_every, config.journal_fsync_seconds).open(append=config.resume)
+        metrics = MetricsRecorder(config.metrics_file, config.metrics_format) if config.metrics_file else None
+
+        site_data, site_changed = fetcher.fetch_json(config.site_data_url)
+        list_urls = site_data.get("lists", [])
+        oldlist_urls = site_data.get("oldlists", [])
+
+        save_json_file(config.oldlists_cache_file, oldlist_urls)
+        print(f"💾 Saved oldlists to {config.oldlists_cache_file}")
+
+        mods_to_process = []
+        mirror_store = self.repos
+        blob_cache = self.blob_cache = BlobScanCache(config.blob_cache_file, config.blob_cache_max_entries)
+        extraction_pool = self.extraction_pool = ExtractionPool(config.cpu_workers)
+
+        def fetch_list(list_index, list_url):
+            print(f"🌐 Fetching mod list: {list_url}")
+            data, changed = fetcher.fetch_json(list_url)
+            mods = parse_mod_list(data, config.allow_local_repos)
+            # Looked up for unchanged lists too: a repo can get new commits
+            # without its list entry changing, and ls-remote is cheap
+            print(f"🔎 Resolving remote HEADs for {len(mods)} mods")
+            remote_heads = mirror_store.remotes.resolve_heads(repo_url for repo_url, *_ in mods)
+            return list_index, mods, changed, remote_heads
+
+        with tempfile.TemporaryDirectory() as temp_dir, \
+                RepoScheduler(config.io_workers, config.adaptive_concurrency, mirror_store.remotes.limiter,
+                              config.retry_backoff_seconds) as scheduler, \
+                ThreadPoolExecutor(max_workers=config.io_workers) as list_executor:
+            # One job per (normalized repo URL, commit): monorepos and mods listed
+            # twice are cloned and scanned once, then attributed to every entry
+            repo_jobs = {}
+            future_to_job = {}
+            # mod_name -> (index of the list it was taken from, its job or None);
+            # a mod in several lists is handled once, for the earliest list
+            claimed_mods = {mod_name: (-1, None) for mod_name in finished_mods}
+
+            def schedule(list_index, mods, remote_heads):
+                for repo_url, mod_name, mod_version, mod_path in mods:
+                    claimed = claimed_mods.get(mod_name)
+                    if claimed:
+                        if claimed[0] <= list_index:
+                            continue
+                        # Lists arrive in any order; a later one got here first
+                        if claimed[1]:
+                            claimed[1]["entries"] = [entry for entry in claimed[1]["entries"] if entry[0] != mod_name]
+                    claimed_mods[mod_name] = (list_index, None)
+                    cache_entry = mod_cache.get(mod_name)
+                    remote_sha = remote_heads.get(normalize_repo_url(repo_url))
+                    if needs_scan(cache_entry, mod_version, remote_sha, mod_path):
+                        key = (normalize_repo_url(repo_url), remote_sha)
+                        job = repo_jobs.get(key)
+                        if job is None:
+                            job = repo_jobs[key] = {
+                                "url": repo_url,
+                                "commit": remote_sha,
+                                "entries": [],
+                                "metrics": metrics.mod(mod_name) if metrics else NULL_MOD_METRICS,
+                            }
+                            future = scheduler.submit(expected_cost(cache_entry), self.process_repo, repo_url, remote_sha,
+                                                      temp_dir, job["metrics"])
+                            future_to_job[future] = job
+                        # Entries may still join a running job: results are only merged once scheduling is done
+                        job["entries"].append((mod_name, mod_version, mod_path))
+                        claimed_mods[mod_name] = (list_index, job)
+                        continue
+
+                    # Same code under a new version string: nothing to rescan
+                    cache_entry["version"] = mod_version
+                    if remote_sha:
+                        cache_entry["commit"] = remote_sha
+                    print(f"⏩ Skipping {mod_name} ({'repository unavailable' if cache_entry.get('unavailable') else 'unchanged'})")
+
+            # Repo work for a changed list starts as soon as that list arrives
+            unchanged_lists = []
+            for future in as_completed([list_executor.submit(fetch_list, i, url) for i, url in enumerate(list_urls)]):
+                list_index, mods, changed, remote_heads = future.result()
+                mods_to_process.extend(mods)
+                if changed:
+                    schedule(list_index, mods, remote_heads)
+                else:
+                    unchanged_lists.append((list_index, mods, remote_heads))
+
+            moved = any(
+                needs_scan(mod_cache.get(mod_name), mod_version, remote_heads.get(normalize_repo_url(repo_url)), mod_path)
+                for _, mods, remote_heads in unchanged_lists
+                for repo_url, mod_name, mod_version, mod_path in mods
+            )
+            if not site_changed and len(unchanged_lists) == len(list_urls) and not finished_mods and not moved:
+                print("\n✅ Site data, every mod list and every repo HEAD are unchanged since the last run, nothing to do (use --force to check anyway)")
+                fetcher.save()
+                storage.close()
+                journal.discard()
+                extraction_pool.shutdown()
+                if metrics:
+                    metrics.close()
+                return
+
+            for list_index, mods, remote_heads in unchanged_lists:
+                schedule(list_index, mods, remote_heads)
+
+            if len(repo_jobs) < sum(len(job["entries"]) for job in repo_jobs.values()):
+                print(f"🔗 {sum(len(job['entries']) for job in repo_jobs.values())} mods share {len(repo_jobs)} repository scans")
+
+            for future in as_completed(future_to_job):
+                job = future_to_job[future]
+                try:
+                    result, status = future.result()
+                    job["metrics"].count("mods", len(job["entries"]))
+                    job["metrics"].finish(status)
+
+                    if status == "error":
+                        continue
+
+                    for mod_name, mod_version, mod_path in job["entries"]:
+                        if status == "unavailable":
+                            # Remembered with its last patches, so later runs (and the
+                            # unchanged-run check) skip it until the entry or HEAD changes
+                            patches = patch_index.patches_for(mod_name)
+                            mod_cache[mod_name] = {"version": mod_version, "commit": job["commit"], "unavailable": True}
+                        else:
+                            patches = patches_under_path(result, mod_path)
+                            patch_index.replace_mod(mod_name, patches)
+                            mod_cache[mod_name] = {
+                                "version": mod_version,
+                                "commit": result["commit"],
+                                "cost": update_cost(mod_cache.get(mod_name), result["seconds"], result["bytes"], config.cost_smoothing),
+                            }
+                        if mod_path:
+                            mod_cache[mod_name]["path"] = mod_path
+                        storage.commit_mod(mod_name, mod_cache[mod_name], patches)
+                        journal.append({"mod": mod_name, "entry": mod_cache[mod_name], "patches": sorted(patches)})
+
+                        if status == "unavailable":
+                            print(f"🚫 {mod_name}: repository unavailable, skipped until its list entry or HEAD changes")
+                        else:
+                            print(f"✅ Updated {mod_name}: {len(patches)} patches")
+
+                except Exception as e:
+                    print(f"❌ Error processing {job['url']}: {e}")
+
+            if scheduler.adaptive and future_to_job:
+                print(f"⚙️ Repo jobs ran up to {scheduler.peak_running} at once "
+                      f"(limit peaked at {scheduler.peak_limit}, now {scheduler.limit}, max {scheduler.max_workers})")
+
+        extraction_pool.shutdown()
+
+        # Compact: the saved files now hold everything the journal recorded
+        journal.close()
+        storage.save(patch_index, mod_cache)
+        storage.close()
+        journal.discard()
+        write_lookup_index(patch_index, config.lookup_index_file)
+        # Only once the results are saved, otherwise a crashed run would look "unchanged" next time
+        fetcher.save()
+
+        # A list that failed to load would make all of its mods look delisted
+        if list_urls and not fetcher.failed.intersection(list_urls):
+            for url in mirror_store.evict(repo_url for repo_url, *_ in mods_to_process):
+                print(f"🗑️ Evicted mirror of {url}")
+        mirror_store.save()
+        blob_cache.save()
+        print(f"💾 Blob cache: {blob_cache.hits} hits, {blob_cache.misses} misses, {len(blob_cache.entries)} entries in {config.blob_cache_file}")
+        print(f"💾 Mirror cache: {mirror_store.total_size() / (1024 * 1024):.1f} MB in {config.mirror_cache_dir}")
+        if metrics:
+            metrics.close()
+
+        print(f"\n✅ Done. {len(patch_index)} patch entries saved to {config.storage_db_file or config.patch_map_file}")
+
+    def scan_blobs(self, repo_url, mirror_path, treeish, paths, metrics=NULL_MOD_METRICS):
+        """
+        Patches of the .cs blobs in paths ({blob_sha: [paths]}) below treeish of a
+        mirror. Cached blobs are not read; the rest are prefetched in one go and
+        extracted in the extraction pool, oversized ones streamed on this thread.
+        Returns: {blob_sha: patches} without the blobs the oversize policy skipped
+        """
+        config = self.config
+        blob_cache = self.blob_cache
+        found = {}
+        uncached = []
+        for sha, blob_paths in paths.items():
+            patches = blob_cache.get(sha)
+            if patches is None:
+                uncached.append(sha)
+            else:
+                metrics.count("cached_files", len(blob_paths))
+                found[sha] = patches
+
+        if self.repos.blob_filter and uncached:
+            try:
+                with metrics.stage("prefetch"):
+                    self.repos.remotes.prefetch_blobs(mirror_path, treeish, uncached, repo_url)
+            except Exception as e:
+                print(f"⚠️ Bulk blob fetch for {repo_url} failed, falling back to lazy fetch: {e}")
+
+        sizes = blob_sizes(mirror_path, uncached)
+        small = []
+        oversized = []
+        for sha in uncached:
+            scan, limit = oversize_limit(sizes[sha], paths[sha][0], config.max_scan_file_bytes, config.oversize_policy)
+            if scan:
+                (small if sizes[sha] <= config.max_scan_file_bytes else oversized).append((sha, limit))
+
+        with metrics.stage("extract", exclusive=True):
+            found.update(extract_blobs(iter_blob_data(mirror_path, [sha for sha, _ in small]), paths,
+                                       blob_cache, self.extraction_pool, metrics, config.extract_batch_bytes))
+
+            # Too large to hold in memory or ship to the pool: stream them here
+            for sha, limit in oversized:
+                patches = extract_harmony_patches_from_chunks(iter_blob_chunks(mirror_path, sha, limit, config.scan_chunk_bytes))
+                metrics.count("bytes_read", min(sizes[sha], limit or sizes[sha]))
+                # The head of a blob is not its result: cached, it would outlive the policy
+                if limit is None:
+                    blob_cache.put(sha, patches)
+                found[sha] = patches
+        return found
+
+    def process_repo(self, repo_url, commit, temp_dir, metrics=NULL_MOD_METRICS):
+        """
+        Updates the repo's mirror and scans it for Harmony patches, either straight
+        from the object database (scan_mode "odb") or from a worktree in temp_dir.
+        Files whose blob hash is already in the blob cache are not parsed again;
+        the rest are read on this thread and extracted in the extraction pool.
+        commit is the remote HEAD resolved before the crawl; None scans the mirror's HEAD.
+        The patches of each file are kept by repo-relative path, so mods sharing
+        the repo can be attributed per subdirectory (see patches_under_path).
+        metrics receives per-stage timings and counters.
+        Returns: (patch_data_dict, status_string) with status "updated", "error",
+        or "unavailable" when the remote is gone or needs credentials
+        """
+        config = self.config
+        blob_cache = self.blob_cache
+        metrics = ReadTally(metrics)
+        metrics.begin()
+        started_at = time.perf_counter()
+        patches_found = set()
+        patches_by_path = {}
+
+        def collect(patches, path):
+            patches_found.update(patches)
+            if patches:
+                patches_by_path[path] = patches
+
+        def collect_blobs(found, paths):
+            for blob_sha, patches in found.items():
+                for path in paths[blob_sha]:
+                    collect(patches, path)
+
+        try:
+            with metrics.stage("clone"):
+                mirror_path = self.repos.ensure(repo_url)
+                with Repo(mirror_path) as mirror:
+                    commit = mirror.git.rev_parse(f"{commit or 'HEAD'}^{{commit}}")
+        except Exception as e:
+            print(f"❌ Failed to clone {repo_url}: {e}")
+            # A deleted or private repo is no sign of an overloaded host
+            return None, "unavailable" if is_permanent_git_error(e) else "error"
+
+        try:
+            if config.scan_mode == "odb":
+                with metrics.stage("walk"):
+                    blobs = list_cs_blobs(mirror_path, commit)
+                metrics.count("files", len(blobs))
+                paths = {}
+                for path, sha in blobs:
+                    paths.setdefault(sha, []).append(path)
+                collect_blobs(self.scan_blobs(repo_url, mirror_path, commit, paths, metrics), paths)
+            else:
+                # Named after the mirror, which is unique per normalized URL
+                repo_path = os.path.join(temp_dir, f"{Path(mirror_path).stem}_{commit[:12]}")
+                with metrics.stage("checkout"), Repo(mirror_path) as mirror:
+                    mirror.git.worktree("prune")
+                    mirror.git.worktree("add", "--detach", repo_path, commit)
+                try:
+                    paths = {}
+
+                    def relative(path):
+                        return path.relative_to(repo_path).as_posix()
+
+                    def read_uncached():
+                        for path in metrics.timed_iter("walk", Path(repo_path).rglob("*.cs")):
+                            metrics.count("files")
+                            try:
+                                size = path.stat().st_size
+                                if size > config.max_scan_file_bytes:
+                                    # Hash and scan in chunks rather than loading the file
+                                    scan_oversized(path, size)
+                                    continue
+                                data = path.read_bytes()
+                            except Exception as e:
+                                print(f"⚠️ Error reading {path}: {e}")
+                                continue
+                            sha = git_blob_sha(data)
+                            patches = blob_cache.get(sha)
+                            if patches is not None:
+                                metrics.count("cached_files")
+                                collect(patches, relative(path))
+                            elif sha in paths:
+                                paths[sha].append(relative(path))
+                            else:
+                                paths[sha] = [relative(path)]
+                                yield sha, data
+
+                    def scan_oversized(path, size):
+                        scan, limit = oversize_limit(size, relative(path), config.max_scan_file_bytes, config.oversize_policy)
+                        if not scan:
+                            return
+                        if limit is not None:
+                            # Only the head is read: no hash of the whole file, and nothing cached that a later policy could reuse
+                            with open(path, 'rb') as file:
+                                patches = extract_harmony_patches_from_chunks(iter_file_chunks(file, limit, config.scan_chunk_bytes))
+                            metrics.count("bytes_read", limit)
+                            collect(patches, relative(path))
+                            return
+
+                        digest = hashlib.sha1(b"blob %d\0" % size)
+                        with open(path, 'rb') as file:
+                            for chunk in iter_file_chunks(file, chunk_bytes=config.scan_chunk_bytes):
+                                digest.update(chunk)
+                        metrics.count("bytes_read", size)
+                        sha = digest.hexdigest()
+                        patches = blob_cache.get(sha)
+                        if patches is None:
+                            with open(path, 'rb') as file:
+                                patches = extract_harmony_patches_from_chunks(iter_file_chunks(file, chunk_bytes=config.scan_chunk_bytes))
+                            blob_cache.put(sha, patches)
+                        collect(patches, relative(path))
+
+                    with metrics.stage("extract", exclusive=True):
+                        collect_blobs(extract_blobs(read_uncached(), paths, blob_cache, self.extraction_pool, metrics,
+                                                    config.extract_batch_bytes), paths)
+                finally:
+                    with Repo(mirror_path) as mirror:
+                        mirror.git.worktree("remove", "--force", repo_path)
+        except Exception as e:
+            print(f"❌ Failed to scan {repo_url}: {e}")
+            return None, "error"
+
+        metrics.count("patches", len(patches_found))
+        return {
+            "commit": commit,
+            "patches": patches_found,
+            "patches_by_path": patches_by_path,
+            "seconds": time.perf_counter() - started_at,
+            "bytes": self.repos.size_of(repo_url),
+            "bytes_read": metrics.bytes_read,
+        }, "updated"
+
+    def scan_repo_history(self, repo_url, entries, previous=None):
+        """
+        Scans every version from list_versions() of one repo. The first version is
+        scanned in full; each later one only re-extracts the .cs files its tree
+        diff touches, and unchanged file contents are answered by the blob cache.
+        entries are the (mod_name, mod_path) list entries sharing the repo.
+        previous is this repo's result from the last history run; it is reused
+        when neither the versions, the entries nor the extractor changed.
+        Returns: {"refs": digest of all three, "mods": {mod_name: history entry}}
+        """
+        mirror_path = self.repos.ensure(repo_url)
+        versions = list_versions(mirror_path)
+        refs = hashlib.sha1(json.dumps([extractor_fingerprint(), versions, sorted(entries, key=str)]).encode('utf-8')).hexdigest()
+        if previous and previous.get("refs") == refs:
+            return previous
+
+        histories = {mod_name: {"repo": repo_url, "path": mod_path, "versions": []} for mod_name, mod_path in entries}
+        current = {mod_name: set() for mod_name, _ in entries}
+        file_patches = {}  # path -> patches in the version being scanned
+        previous_commit = None
+
+        for version, commit, date in versions:
+            if previous_commit is None:
+                changed, deleted = list_cs_blobs(mirror_path, commit), []
+            else:
+                changed, deleted = diff_cs_blobs(mirror_path, previous_commit, commit)
+            previous_commit = commit
+
+            paths = {}
+            for path, sha in changed:
+                paths.setdefault(sha, []).append(path)
+            found = self.scan_blobs(repo_url, mirror_path, commit, paths)
+
+            for path in deleted:
+                file_patches.pop(path, None)
+            for path, sha in changed:
+                if found.get(sha):
+                    file_patches[path] = found[sha]
+                else:
+                    file_patches.pop(path, None)
+
+            result = {"patches": set().union(*file_patches.values()), "patches_by_path": file_patches}
+            for mod_name, mod_path in entries:
+                patches = patches_under_path(result, mod_path)
+                histories[mod_name]["versions"].append({
+                    "version": version,
+                    "commit": commit,
+                    "date": date,
+                    "added": sorted(patches - current[mod_name]),
+                    "removed": sorted(current[mod_name] - patches),
+                })
+                current[mod_name] = patches
+
+        return {"refs": refs, "mods": histories}
+
+    def run_history(self):
+        """
+        Scans every tagged version of every mod in the current lists and the
+        oldlists, one mirror per repo, and saves the result to config.history_file.
+        """
+        config = self.config
+        # Lists are read through the HTTP cache but it is not updated: only run() decides what changed
+        site_data, _ = self.fetcher.fetch_json(config.site_data_url)
+        list_urls = site_data.get("lists", []) + site_data.get("oldlists", [])
+
+        # A mod in several lists is taken from the first, current lists before oldlists
+        repos = {}
+        seen_mods = set()
+        for list_url in list_urls:
+            print(f"🌐 Fetching mod list: {list_url}")
+            for repo_url, mod_name, _, mod_path in parse_mod_list(self.fetcher.fetch_json(list_url)[0], config.allow_local_repos):
+                if mod_name in seen_mods:
+                    continue
+                seen_mods.add(mod_name)
+                repo = repos.setdefault(normalize_repo_url(repo_url), {"url": repo_url, "entries": []})
+                repo["entries"].append((mod_name, mod_path))
+
+        history = PatchHistory.load(config.history_file)
+        blob_cache = self.blob_cache = BlobScanCache(config.blob_cache_file, config.blob_cache_max_entries)
+        self.extraction_pool = ExtractionPool(config.cpu_workers)
+        print(f"🕰️ Scanning the version history of {len(repos)} repositories ({len(seen_mods)} mods)")
+
+        scanned = {}
+        with ThreadPoolExecutor(max_workers=config.io_workers) as executor:
+            future_to_key = {
+                executor.submit(self.scan_repo_history, repo["url"], repo["entries"], history.data["repos"].get(key)): key
+                for key, repo in repos.items()
+            }
+            for future in as_completed(future_to_key):
+                key = future_to_key[future]
+                try:
+                    scanned[key] = future.result()
+                    versions = max((len(h["versions"]) for h in scanned[key]["mods"].values()), default=0)
+                    print(f"✅ {repos[key]['url']}: {versions} versions")
+                except Exception as e:
+                    print(f"❌ Failed to scan the history of {repos[key]['url']}: {e}")
+                    # Keep what an earlier run found rather than losing the repo
+                    if key in history.data["repos"]:
+                        scanned[key] = history.data["repos"][key]
+
+        self.extraction_pool.shutdown()
+        history.data["repos"] = scanned
+        history.save(config.history_file)
+        self.repos.save()
+        blob_cache.save()
+        print(f"💾 Blob cache: {blob_cache.hits} hits, {blob_cache.misses} misses, {len(blob_cache.entries)} entries in {config.blob_cache_file}")
+        print(f"\n✅ Done. History of {len(history.mods())} mods saved to {config.history_file}")
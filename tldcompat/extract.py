@@ -0,0 +1,155 @@
+"""
+Harmony patch extraction from C# source. This module only needs `re`, so
+editor integrations and pre-commit hooks can import it without the crawler.
+"""
+import re
+
+# One pattern for every supported [HarmonyPatch(...)] form. The first argument is
+# a string, nameof() or typeof(); the optional second argument is a string or
+# nameof(); an optional trailing "new Type[] { ... }" is accepted and ignored.
+HARMONY_ATTRIBUTE_PATTERN = re.compile(
+    r'\[HarmonyPatch\s*\(\s*'
+    r'(?:"(?P<str1>[\w\.]+)"|nameof\s*\(\s*(?P<nameof1>[\w\.]+)\s*\)|typeof\s*\(\s*(?P<typeof1>[\w\.]+)\s*\))'
+    r'(?:\s*,\s*(?:"(?P<str2>[\w\.]+)"|nameof\s*\(\s*(?P<nameof2>[\w\.]+)\s*\)))?'
+    r'\s*(?:,\s*new\s+Type\[\]\s*\{[^\}]*\})?\s*\)\]'
+)
+
+# Bump whenever extract_harmony_patches_from_code starts returning something
+# different for the same input; it invalidates every cached scan result.
+EXTRACTOR_VERSION = 1
+
+# Output is grouped by argument form, in the order the original nine-pass
+# scanner emitted them:
+#   1. ("Class.Method")        2. ("Class", "Method")        3. ("Class", nameof(Method))
+#   4. (nameof(Class.Method))  5. (nameof(Class), "Method")  6. (nameof(Class), nameof(Method))
+#   7. (typeof(Class))         8. (typeof(Class), "Method")  9. (typeof(Class), nameof(Method))
+_FORM_ORDER = {
+    ('str1', None): 0, ('str1', 'str2'): 1, ('str1', 'nameof2'): 2,
+    ('nameof1', None): 3, ('nameof1', 'str2'): 4, ('nameof1', 'nameof2'): 5,
+    ('typeof1', None): 6, ('typeof1', 'str2'): 7, ('typeof1', 'nameof2'): 8,
+}
+
+def normalize_patch_target(cls, method):
+    if not cls:
+        cls = '?UnknownClass'
+    if not method:
+        return cls
+
+    cls_parts = cls.split('.')
+    method_parts = method.split('.')
+
+    # Find largest k where last k parts of class == first k parts of method
+    max_overlap = 0
+    max_k = min(len(cls_parts), len(method_parts))
+    for k in range(max_k, 0, -1):
+        if cls_parts[-k:] == method_parts[:k]:
+            max_overlap = k
+            break
+
+    method_suffix = method_parts[max_overlap:] if max_overlap else method_parts
+
+    return f"{cls}.{'.'.join(method_suffix)}"
+
+# Longest [HarmonyPatch(...)] attribute the byte scanner decodes around a match;
+# also the overlap kept between chunks of a streamed file
+MAX_ATTRIBUTE_BYTES = 8192
+
+def classify_harmony_attribute(match):
+    """
+    Returns: (form index, normalized patch) for a HARMONY_ATTRIBUTE_PATTERN
+    match, or None when a lone string/nameof argument names no method.
+    """
+    groups = match.groupdict()
+    first = 'str1' if groups['str1'] is not None else 'nameof1' if groups['nameof1'] is not None else 'typeof1'
+    second = 'str2' if groups['str2'] is not None else 'nameof2' if groups['nameof2'] is not None else None
+    cls = groups[first]
+
+    if second:
+        patch = normalize_patch_target(cls, groups[second])
+    elif first == 'typeof1':
+        patch = normalize_patch_target(*cls.rsplit('.', 1)) if '.' in cls else normalize_patch_target(cls, None)
+    else:
+        # A lone string/nameof argument must name "Class.Method"
+        cls, sep, method = cls.rpartition('.')
+        if not (cls and sep and method):
+            return None
+        patch = normalize_patch_target(cls, method)
+
+    return _FORM_ORDER[(first, second)], patch
+
+def extract_harmony_patches_from_code(code):
+    """
+    Single pass over the source: every [HarmonyPatch(...)] attribute is matched
+    once and classified by its argument form.
+    Returns the normalized "Class.Method" (or bare "Class") targets.
+    """
+    if 'HarmonyPatch' not in code:
+        return []
+
+    buckets = [[] for _ in range(len(_FORM_ORDER))]
+
+    for match in HARMONY_ATTRIBUTE_PATTERN.finditer(code):
+        classified = classify_harmony_attribute(match)
+        if classified:
+            buckets[classified[0]].append(classified[1])
+
+    return [patch for bucket in buckets for patch in bucket]
+
+def scan_attribute_bytes(buffer, stop, skip_until, buckets):
+    """
+    Matches the attributes starting before stop in buffer, decoding only a
+    MAX_ATTRIBUTE_BYTES window at each b"[HarmonyPatch". Candidates before
+    skip_until lie inside an earlier match and are ignored, as with finditer.
+    Returns the offset right after the last match (or skip_until).
+    """
+    # find() only reports needles that end before its bound
+    end = stop + len(b'[HarmonyPatch') - 1
+    position = buffer.find(b'[HarmonyPatch', skip_until, end)
+    while position >= 0:
+        # surrogateescape keeps invalid bytes one character each, so offsets map back exactly
+        window = bytes(buffer[position:position + MAX_ATTRIBUTE_BYTES]).decode('utf-8', errors='surrogateescape')
+        match = HARMONY_ATTRIBUTE_PATTERN.match(window)
+        next_start = position + 1
+        if match:
+            classified = classify_harmony_attribute(match)
+            if classified:
+                buckets[classified[0]].append(classified[1])
+            next_start = position + len(window[:match.end()].encode('utf-8', errors='surrogateescape'))
+            skip_until = next_start
+        position = buffer.find(b'[HarmonyPatch', next_start, end)
+    return skip_until
+
+def extract_harmony_patches_from_bytes(data):
+    """
+    Byte-level extract_harmony_patches_from_code for raw file contents
+    (bytes, bytearray, mmap). Data without b"HarmonyPatch" is rejected without
+    decoding, and only the text around each attribute is decoded, leniently,
+    so invalid UTF-8 elsewhere no longer discards the whole file.
+    """
+    if data.find(b'HarmonyPatch') < 0:
+        return []
+    buckets = [[] for _ in range(len(_FORM_ORDER))]
+    scan_attribute_bytes(data, len(data), 0, buckets)
+    return [patch for bucket in buckets for patch in bucket]
+
+def extract_harmony_patches_from_chunks(chunks):
+    """
+    extract_harmony_patches_from_bytes over an iterable of byte chunks, holding
+    at most one chunk plus MAX_ATTRIBUTE_BYTES of overlap in memory.
+    """
+    buckets = [[] for _ in range(len(_FORM_ORDER))]
+    carry = b''
+    skip_until = 0
+
+    for chunk in chunks:
+        buffer = carry + chunk
+        # Attributes starting before stop are guaranteed a full window in this buffer
+        stop = max(len(buffer) - MAX_ATTRIBUTE_BYTES, 0)
+        if stop and buffer.find(b'HarmonyPatch', skip_until) >= 0:
+            skip_until = scan_attribute_bytes(buffer, stop, skip_until, buckets)
+        carry = buffer[stop:]
+        skip_until = max(skip_until - stop, 0)
+
+    if carry.find(b'HarmonyPatch', skip_until) >= 0:
+        scan_attribute_bytes(carry, len(carry), skip_until, buckets)
+    return [patch for bucket in buckets for patch in bucket]
@@ -0,0 +1,94 @@
+"""
+HTTP side of a crawl: one pooled requests session and conditional JSON fetching.
+"""
+import threading
+
+import requests
+
+from .config import Config
+from .util import load_json_file, save_json_file
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+def http_session(pool_size=Config.http_pool_size):
+    """One requests session for the whole process so connections are reused."""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            _http_session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            _http_session.mount("http://", adapter)
+            _http_session.mount("https://", adapter)
+        return _http_session
+
+def fetch_json(url, timeout=Config.http_timeout):
+    try:
+        response = http_session().get(url, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+    except Exception as e:
+        print(f"❌ Failed to fetch or parse JSON from {url}: {e}")
+        return {}
+
+class HttpFetcher:
+    """
+    Conditional JSON fetching on top of the shared session. The last body of
+    every URL is kept on disk with its ETag / Last-Modified, which are sent
+    back as If-None-Match / If-Modified-Since on the next run. URLs whose
+    last fetch failed are kept in failed.
+    """
+
+    def __init__(self, cache_path=Config.http_cache_file, conditional=True, timeout=Config.http_timeout,
+                 pool_size=Config.http_pool_size):
+        self.cache_path = cache_path
+        self.conditional = conditional
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.cache = load_json_file(cache_path, {})
+        self.failed = set()
+        self._lock = threading.Lock()
+
+    def fetch_json(self, url):
+        """
+        Returns: (data, changed). changed is False when the server confirmed the
+        cached copy (304) or sent back an identical body.
+        """
+        with self._lock:
+            cached = self.cache.get(url)
+
+        headers = {}
+        if cached and self.conditional:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        try:
+            response = http_session(self.pool_size).get(url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and cached:
+                with self._lock:
+                    self.failed.discard(url)
+                return cached["body"], False
+            response.raise_for_status()
+            data = response.json()
+        except Exception as e:
+            print(f"❌ Failed to fetch or parse JSON from {url}: {e}")
+            with self._lock:
+                self.failed.add(url)
+            return {}, True
+
+        with self._lock:
+            self.failed.discard(url)
+            self.cache[url] = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "body": data,
+            }
+
+        changed = not (self.conditional and cached and cached.get("body") == data)
+        return data, changed
+
+    def save(self):
+        with self._lock:
+            save_json_file(self.cache_path, self.cache)
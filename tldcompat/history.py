@@ -0,0 +1,56 @@
+"""
+Patch map over time, one entry per tagged version of every mod.
+"""
+from .config import Config
+from .util import load_json_file, save_json_file
+
+class PatchHistory:
+    """
+    Time-indexed patch map: for every mod, its versions oldest first with the
+    patches each version added and removed, as written by Crawler.run_history().
+    """
+
+    def __init__(self, data=None):
+        self.data = data or {"format": 1, "repos": {}}
+
+    @classmethod
+    def load(cls, path=Config.history_file):
+        return cls(load_json_file(path, None))
+
+    def save(self, path=Config.history_file):
+        save_json_file(path, self.data, compact=True)
+
+    def mods(self):
+        return {mod_name: history for repo in self.data["repos"].values() for mod_name, history in repo["mods"].items()}
+
+    def patches_at(self, mod_name, version=None):
+        """Patches of mod_name as of version (a tag, commit or unix time); None means the latest version."""
+        patches = set()
+        for entry in self.mods().get(mod_name, {}).get("versions", []):
+            if isinstance(version, (int, float)) and entry["date"] > version:
+                break
+            patches.difference_update(entry["removed"])
+            patches.update(entry["added"])
+            if version in (entry["version"], entry["commit"]):
+                break
+        return patches
+
+    def first_patched(self, mod_name, patch):
+        """The first version of mod_name that patches patch, or None if none does."""
+        for entry in self.mods().get(mod_name, {}).get("versions", []):
+            if patch in entry["added"]:
+                return entry
+        return None
+
+    def timeline(self, patch, mod_names=None):
+        """Every version, of every mod or of mod_names, that started or stopped patching patch, by date."""
+        events = []
+        for mod_name, history in self.mods().items():
+            if mod_names and mod_name not in mod_names:
+                continue
+            for entry in history["versions"]:
+                for change in ("added", "removed"):
+                    if patch in entry[change]:
+                        events.append({"mod": mod_name, "change": change, "version": entry["version"],
+                                       "commit": entry["commit"], "date": entry["date"]})
+        return sorted(events, key=lambda event: (event["date"], event["mod"]))
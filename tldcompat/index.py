@@ -0,0 +1,190 @@
+"""
+In-memory patch index and the compact lookup index that `check` loads.
+"""
+import bisect
+import json
+import sys
+
+from .config import Config
+from .util import save_json_file
+
+class PatchIndex:
+    """
+    Bidirectional index of patch -> mods and mod -> patches, both as sets of
+    interned strings. Replacing a mod's patches only touches the patches it
+    had or has now, whatever the size of the map. The patch_map.json and
+    mod_cache.json shapes are only produced when saving.
+    """
+
+    def __init__(self):
+        self.mods_by_patch = {}
+        self.patches_by_mod = {}
+        self._sorted_patches = None  # Rebuilt lazily for prefix queries
+
+    @classmethod
+    def from_patch_map(cls, patch_map):
+        index = cls()
+        for patch, mods in patch_map.items():
+            for mod_name in mods:
+                index.add(mod_name, [patch])
+        return index
+
+    def add(self, mod_name, patches):
+        mod_name = sys.intern(mod_name)
+        mod_patches = self.patches_by_mod.setdefault(mod_name, set())
+        for patch in patches:
+            patch = sys.intern(patch)
+            if patch not in self.mods_by_patch:
+                self.mods_by_patch[patch] = set()
+                self._sorted_patches = None
+            self.mods_by_patch[patch].add(mod_name)
+            mod_patches.add(patch)
+
+    def remove(self, mod_name, patches):
+        mod_patches = self.patches_by_mod.get(mod_name)
+        if mod_patches is None:
+            return
+        for patch in patches:
+            mod_patches.discard(patch)
+            mods = self.mods_by_patch.get(patch)
+            if mods is None:
+                continue
+            mods.discard(mod_name)
+            if not mods:
+                del self.mods_by_patch[patch]
+                self._sorted_patches = None
+        if not mod_patches:
+            del self.patches_by_mod[mod_name]
+
+    def remove_mod(self, mod_name):
+        self.remove(mod_name, list(self.patches_by_mod.get(mod_name, ())))
+
+    def replace_mod(self, mod_name, patches):
+        """Sets mod_name's patches to exactly patches, touching only the difference."""
+        new = set(patches)
+        old = self.patches_by_mod.get(mod_name, set())
+        self.remove(mod_name, old - new)
+        self.add(mod_name, new - old)
+        if not new:
+            self.patches_by_mod.pop(mod_name, None)
+
+    def patches_for(self, mod_name):
+        return set(self.patches_by_mod.get(mod_name, ()))
+
+    def mods_for(self, patch):
+        return set(self.mods_by_patch.get(patch, ()))
+
+    def patches_under(self, prefix):
+        """Patches equal to prefix or nested below it, e.g. "Panel_Map" -> "Panel_Map.Enable"."""
+        if self._sorted_patches is None:
+            self._sorted_patches = sorted(self.mods_by_patch)
+        patches = [prefix] if prefix in self.mods_by_patch else []
+        start = bisect.bisect_left(self._sorted_patches, prefix + ".")
+        # "/" is the character right after "." so this bounds everything starting with prefix + "."
+        end = bisect.bisect_left(self._sorted_patches, prefix + "/")
+        patches.extend(self._sorted_patches[start:end])
+        return patches
+
+    def mods_patching_class(self, class_name):
+        """Mods that patch class_name itself or any of its methods."""
+        mods = set()
+        for patch in self.patches_under(class_name):
+            mods |= self.mods_by_patch[patch]
+        return mods
+
+    def shared_patches(self, min_mods=2):
+        """Patches that at least min_mods mods patch. Returns: {patch: sorted mods}"""
+        return {
+            patch: sorted(mods)
+            for patch, mods in sorted(self.mods_by_patch.items())
+            if len(mods) >= min_mods
+        }
+
+    def to_patch_map(self):
+        return {patch: sorted(mods) for patch, mods in sorted(self.mods_by_patch.items())}
+
+    def __len__(self):
+        return len(self.mods_by_patch)
+
+def write_lookup_index(patch_index, path=Config.lookup_index_file):
+    """Saves the crawl result in the compact form ConflictIndex loads: mods are stored once and referenced by id."""
+    mods = sorted(patch_index.patches_by_mod)
+    mod_ids = {mod_name: i for i, mod_name in enumerate(mods)}
+    save_json_file(path, {
+        "format": 1,
+        "mods": mods,
+        "patches": {
+            patch: sorted(mod_ids[mod_name] for mod_name in patch_mods)
+            for patch, patch_mods in sorted(patch_index.mods_by_patch.items())
+        },
+    }, compact=True)
+
+class ConflictIndex:
+    """
+    Read-only lookup of published patches, built once from patch_lookup.json.
+    Patch names live in a trie of their dotted segments, so a bare class key
+    (from a typeof(Class)-only patch) matches every method below that class,
+    and a method matches class-level patches of every enclosing class.
+    """
+
+    _MODS = None  # Trie key holding the mods of the patch that ends at a node
+
+    def __init__(self, mods, patches):
+        self.mods = mods
+        self.root = {}
+        for patch, mod_ids in patches.items():
+            node = self.root
+            for segment in patch.split('.'):
+                node = node.setdefault(segment, {})
+            node[self._MODS] = mod_ids
+
+    @classmethod
+    def load(cls, path=Config.lookup_index_file):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data["mods"], data["patches"])
+
+    @classmethod
+    def from_patch_index(cls, patch_index):
+        mods = sorted(patch_index.patches_by_mod)
+        mod_ids = {mod_name: i for i, mod_name in enumerate(mods)}
+        return cls(mods, {
+            patch: [mod_ids[mod_name] for mod_name in patch_mods]
+            for patch, patch_mods in patch_index.mods_by_patch.items()
+        })
+
+    def _names(self, mod_ids, exclude):
+        return sorted(name for name in (self.mods[i] for i in mod_ids) if name not in exclude)
+
+    def lookup(self, patch, exclude=()):
+        """
+        Returns: {"exact": [mods], "related": {published_patch: [mods]}} where
+        related holds class-level overlaps in either direction.
+        """
+        segments = patch.split('.')
+        related = {}
+        node = self.root
+
+        for depth, segment in enumerate(segments):
+            node = node.get(segment)
+            if node is None:
+                return {"exact": [], "related": related}
+            if depth < len(segments) - 1 and self._MODS in node:
+                mods = self._names(node[self._MODS], exclude)
+                if mods:
+                    related['.'.join(segments[:depth + 1])] = mods
+
+        exact = self._names(node.get(self._MODS, ()), exclude)
+
+        # Everything below the patch: the methods of a class-level patch
+        stack = [(patch, child, segment) for segment, child in node.items() if segment is not self._MODS]
+        while stack:
+            prefix, child, segment = stack.pop()
+            name = f"{prefix}.{segment}"
+            if self._MODS in child:
+                mods = self._names(child[self._MODS], exclude)
+                if mods:
+                    related[name] = mods
+            stack.extend((name, grandchild, key) for key, grandchild in child.items() if key is not self._MODS)
+
+        return {"exact": exact, "related": dict(sorted(related.items()))}
@@ -0,0 +1,241 @@
+"""
+Per-mod timings and counters, and cProfile runs across all threads.
+"""
+import contextlib
+import cProfile
+import json
+import math
+import pstats
+import sys
+import threading
+import time
+
+from .util import save_json_file
+
+def percentile(values, q):
+    """Nearest-rank percentile of values, q in 0..100."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(q * len(ordered) / 100) - 1))]
+
+class ModMetrics:
+    """
+    Timings and counters of one mod, from being queued until its result is
+    merged. Stages may nest; an exclusive stage does not count time spent in
+    the stages nested inside it.
+    """
+
+    def __init__(self, recorder, mod_name):
+        self.recorder = recorder
+        self.mod_name = mod_name
+        self.queued_at = time.perf_counter()
+        self.started_at = None
+        self.thread = None
+        self.timings = {}
+        self.counts = {}
+        self.spans = []  # (stage, start, duration) for trace output
+        self._nested = [0.0]
+
+    def begin(self):
+        self.started_at = time.perf_counter()
+        self.thread = threading.get_ident()
+
+    @contextlib.contextmanager
+    def stage(self, name, exclusive=False):
+        self._nested.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self._nested.pop()
+            self._nested[-1] += elapsed
+            self.timings[name] = self.timings.get(name, 0.0) + (elapsed - nested if exclusive else elapsed)
+            self.spans.append((name, start, elapsed))
+
+    def timed_iter(self, name, iterable):
+        """Counts the time spent producing each item of iterable as stage name."""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def count(self, name, value=1):
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def finish(self, status):
+        self.recorder.record(self, status, time.perf_counter())
+
+class NullModMetrics:
+    """Stand-in when metrics are off: every call is a no-op."""
+
+    _null_stage = contextlib.nullcontext()
+
+    def begin(self):
+        pass
+
+    def stage(self, name, exclusive=False):
+        return self._null_stage
+
+    def timed_iter(self, name, iterable):
+        return iterable
+
+    def count(self, name, value=1):
+        pass
+
+    def finish(self, status):
+        pass
+
+NULL_MOD_METRICS = NullModMetrics()
+
+class ReadTally:
+    """
+    Passes every call on to metrics (which may be NULL_MOD_METRICS) and also
+    totals bytes_read, which the scheduler needs whether metrics are on or not.
+    """
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.bytes_read = 0
+
+    def count(self, name, value=1):
+        if name == "bytes_read":
+            self.bytes_read += value
+        self.metrics.count(name, value)
+
+    def __getattr__(self, name):
+        return getattr(self.metrics, name)
+
+class MetricsRecorder:
+    """
+    Collects ModMetrics of a crawl and writes them to path, either as JSON
+    lines (one record per mod as it finishes, then a run summary) or as a
+    Chrome trace written when the run closes.
+    """
+
+    def __init__(self, path, fmt="jsonl"):
+        self.path = path
+        self.fmt = fmt
+        self.started_at = time.perf_counter()
+        self.records = []
+        self.trace_events = []
+        self._lock = threading.Lock()
+        self._file = open(path, 'w', encoding='utf-8') if fmt == "jsonl" else None
+
+    def mod(self, mod_name):
+        return ModMetrics(self, mod_name)
+
+    def record(self, metrics, status, ended_at):
+        started_at = metrics.started_at or ended_at
+        record = {
+            "type": "mod",
+            "mod": metrics.mod_name,
+            "status": status,
+            "queue_wait": started_at - metrics.queued_at,
+            "total": ended_at - started_at,
+            "timings": metrics.timings,
+            "counts": metrics.counts,
+        }
+
+        with self._lock:
+            self.records.append(record)
+            if self._file:
+                self._file.write(json.dumps(record) + "\n")
+                self._file.flush()
+            else:
+                to_us = lambda seconds: round((seconds - self.started_at) * 1_000_000)
+                self.trace_events.append({
+                    "name": metrics.mod_name, "cat": "mod", "ph": "X", "pid": 1, "tid": metrics.thread or 0,
+                    "ts": to_us(started_at), "dur": round(record["total"] * 1_000_000),
+                    "args": {"status": status, "queue_wait": record["queue_wait"], **metrics.counts},
+                })
+                for name, start, elapsed in metrics.spans:
+                    self.trace_events.append({
+                        "name": name, "cat": "stage", "ph": "X", "pid": 1, "tid": metrics.thread or 0,
+                        "ts": to_us(start), "dur": round(elapsed * 1_000_000), "args": {"mod": metrics.mod_name},
+                    })
+
+    def summary(self):
+        """Run totals plus p50/p90/p99/max of every per-mod timing."""
+        with self._lock:
+            records = list(self.records)
+
+        series = {"queue_wait": [r["queue_wait"] for r in records], "total": [r["total"] for r in records]}
+        totals = {}
+        for record in records:
+            for name, seconds in record["timings"].items():
+                series.setdefault(name, []).append(seconds)
+            for name, value in record["counts"].items():
+                totals[name] = totals.get(name, 0) + value
+
+        return {
+            "type": "run",
+            "wall_time": time.perf_counter() - self.started_at,
+            "mods": len(records),
+            "statuses": {status: sum(1 for r in records if r["status"] == status) for status in {r["status"] for r in records}},
+            "totals": totals,
+            "seconds": {
+                name: {"sum": sum(values), "p50": percentile(values, 50), "p90": percentile(values, 90),
+                       "p99": percentile(values, 99), "max": max(values)}
+                for name, values in series.items() if values
+            },
+        }
+
+    def close(self):
+        summary = self.summary()
+        if self._file:
+            self._file.write(json.dumps(summary) + "\n")
+            self._file.close()
+        else:
+            save_json_file(self.path, {"traceEvents": self.trace_events, "otherData": summary}, compact=True)
+        print(f"📈 Metrics for {summary['mods']} mods written to {self.path}")
+
+def run_profiled(fn, path):
+    """
+    Runs fn under cProfile in every thread it starts and writes a report
+    sorted by cumulative time to path. Extraction processes are not included.
+    From Python 3.12 cProfile is built on sys.monitoring: one profiler sees
+    every thread and no second one can be enabled, so only older versions
+    start a profiler per thread.
+    """
+    profiles = [cProfile.Profile()]
+    per_thread = sys.version_info < (3, 12)
+    warned = []
+
+    def profile_new_thread(*_):
+        profile = cProfile.Profile()
+        try:
+            profile.enable()  # Replaces this hook for the rest of the thread
+        except ValueError as e:
+            # Another profiling tool is active; the thread runs unprofiled
+            sys.setprofile(None)
+            if not warned:
+                warned.append(True)
+                print(f"⚠️ Profiling the main thread only: {e}")
+            return
+        profiles.append(profile)
+
+    if per_thread:
+        threading.setprofile(profile_new_thread)
+    profiles[0].enable()
+    try:
+        return fn()
+    finally:
+        profiles[0].disable()
+        if per_thread:
+            threading.setprofile(None)
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            try:
+                stats.add(profile)
+            except TypeError:
+                pass  # A thread that never made a profiled call
+        with open(path, 'w', encoding='utf-8') as f:
+            stats.stream = f
+            stats.sort_stats("cumulative").print_stats(80)
+        print(f"📈 Profile written to {path}")
@@ -0,0 +1,69 @@
+"""
+Extraction in worker processes, so the regex work runs beside the git I/O.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from .config import Config
+from .extract import extract_harmony_patches_from_bytes
+
+def extract_blob_batch(batch):
+    """
+    Extraction task for the process pool.
+    batch: [(blob_sha, bytes)]
+    Returns: [(blob_sha, patches, error)] with patches None when the blob could not be decoded
+    """
+    results = []
+    for blob_sha, data in batch:
+        try:
+            results.append((blob_sha, extract_harmony_patches_from_bytes(data), None))
+        except Exception as e:
+            results.append((blob_sha, None, str(e)))
+    return results
+
+class ExtractionPool:
+    """
+    Runs extract_blob_batch in worker processes so the regex work does not
+    compete with the I/O threads for the GIL. At most max_pending batches are
+    queued or running at once; submit blocks beyond that, which keeps the
+    amount of source held in memory bounded however fast the readers are.
+    With workers == 0 batches are extracted inline on the calling thread.
+    """
+
+    def __init__(self, workers=Config.cpu_workers, max_pending=None):
+        self.workers = workers
+        # spawn, not fork: the pool is started while I/O threads are running
+        self.executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) if workers > 0 else None
+        self._slots = threading.BoundedSemaphore(max_pending or max(2 * workers, 1))
+
+    def submit(self, batch):
+        if self.executor is None:
+            future = Future()
+            future.set_result(extract_blob_batch(batch))
+            return future
+
+        self._slots.acquire()
+        try:
+            future = self.executor.submit(extract_blob_batch, batch)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+
+def iter_batches(items, max_bytes=Config.extract_batch_bytes):
+    """Groups (blob_sha, bytes) pairs into batches of roughly max_bytes."""
+    batch, size = [], 0
+    for blob_sha, data in items:
+        batch.append((blob_sha, data))
+        size += len(data)
+        if size >= max_bytes:
+            yield batch
+            batch, size = [], 0
+    if batch:
+        yield batch
@@ -0,0 +1,426 @@
+"""
+Git access: persistent mirrors, remote lookups under a per-host rate limit,
+and reading trees and blobs straight out of a mirror's object database.
+"""
+import hashlib
+import os
+import random
+import re
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+
+from git import Repo
+
+from .config import Config
+from .scan import iter_file_chunks
+from .util import directory_size, load_json_file, normalize_repo_url, save_json_file
+
+# Failures that retrying will not fix
+PERMANENT_GIT_ERROR = re.compile(
+    r"not found|does not exist|does not appear to be a git repository|authentication failed|terminal prompts disabled",
+    re.IGNORECASE
+)
+
+def git_error_message(error):
+    return str(getattr(error, "stderr", None) or error)
+
+def is_permanent_git_error(error):
+    return bool(PERMANENT_GIT_ERROR.search(git_error_message(error)))
+
+class HostRateLimiter:
+    """
+    Token bucket per host for git network operations. A host that answered
+    with an error is paused for the retry delay, which holds back every other
+    caller of that host too. backoffs counts those pauses for the scheduler.
+    """
+
+    def __init__(self, rate=Config.host_rate_limit, burst=Config.host_rate_burst):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}  # host -> [tokens, last refill, paused until]
+        self.backoffs = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, host):
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                bucket = self.buckets.setdefault(host, [self.burst, now, 0.0])
+                bucket[0] = min(max(self.burst, 1), bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+                if now >= bucket[2] and bucket[0] >= 1:
+                    bucket[0] -= 1
+                    return
+                wait = max(bucket[2] - now, (1 - bucket[0]) / self.rate)
+            time.sleep(wait)
+
+    def back_off(self, host, seconds):
+        with self._lock:
+            now = time.monotonic()
+            bucket = self.buckets.setdefault(host, [self.burst, now, 0.0])
+            bucket[2] = max(bucket[2], now + seconds)
+            self.backoffs += 1
+
+def repo_host(repo_url):
+    return urlsplit(normalize_repo_url(repo_url)).hostname or "local"
+
+def git_env():
+    # Never hang on a credential prompt for a deleted or private repo
+    return {**os.environ, "GIT_TERMINAL_PROMPT": "0"}
+
+class GitRemotes:
+    """
+    Every git network operation (ls-remote, clone, fetch) goes through here,
+    under the host rate limit and with retries of transient failures.
+    """
+
+    def __init__(self, limiter=None, retries=Config.git_retries, backoff_seconds=Config.retry_backoff_seconds,
+                 lookup_workers=Config.remote_lookup_workers, lookup_timeout=Config.remote_lookup_timeout):
+        self.limiter = limiter or HostRateLimiter()
+        self.retries = retries
+        self.backoff_seconds = backoff_seconds
+        self.lookup_workers = lookup_workers
+        self.lookup_timeout = lookup_timeout
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            HostRateLimiter(config.host_rate_limit, config.host_rate_burst),
+            config.git_retries, config.retry_backoff_seconds,
+            config.remote_lookup_workers, config.remote_lookup_timeout
+        )
+
+    def with_retries(self, repo_url, action, operation):
+        """
+        Runs operation() under the rate limit of repo_url's host. Transient failures
+        are retried up to self.retries times with exponential backoff and full jitter.
+        """
+        host = repo_host(repo_url)
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire(host)
+            try:
+                return operation()
+            except Exception as e:
+                if attempt == self.retries or is_permanent_git_error(e):
+                    raise
+                message = git_error_message(e)
+                delay = random.uniform(0, self.backoff_seconds * 2 ** attempt)
+                print(f"🔁 {action} of {repo_url} failed, retrying in {delay:.1f}s: {message.strip()[:200]}")
+                self.limiter.back_off(host, delay)
+                time.sleep(delay)
+
+    def resolve_head(self, repo_url):
+        """Commit SHA that the remote's HEAD points at, without cloning anything."""
+        output = self.with_retries(repo_url, "ls-remote", lambda: subprocess.run(
+            ["git", "ls-remote", repo_url, "HEAD"],
+            check=True, capture_output=True, text=True, timeout=self.lookup_timeout, env=git_env()
+        )).stdout.split()
+        return output[0] if output else None
+
+    def resolve_heads(self, repo_urls):
+        """
+        Resolves the HEAD commit of every remote concurrently.
+        Returns: {normalized_repo_url: sha or None if the lookup failed}
+        """
+        urls = {normalize_repo_url(url): url for url in repo_urls}
+        heads = {}
+
+        def lookup(url):
+            try:
+                return self.resolve_head(url)
+            except Exception as e:
+                print(f"⚠️ Could not resolve HEAD of {url}: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=self.lookup_workers) as executor:
+            future_to_key = {executor.submit(lookup, url): key for key, url in urls.items()}
+            for future in as_completed(future_to_key):
+                heads[future_to_key[future]] = future.result()
+
+        return heads
+
+    def prefetch_blobs(self, git_dir, treeish, blob_shas, repo_url=None):
+        """
+        In a partial mirror, downloads the wanted blobs that are not present yet
+        in a single fetch instead of one lazy fetch per blob.
+        """
+        missing = subprocess.run(
+            ["git", "--git-dir", git_dir, "rev-list", "--objects", "--missing=print", "--no-walk", treeish],
+            check=True, capture_output=True, text=True
+        ).stdout
+        missing = {line[1:].strip() for line in missing.splitlines() if line.startswith('?')}
+        wanted = [sha for sha in blob_shas if sha in missing]
+        if not wanted:
+            return
+
+        self.with_retries(repo_url or git_dir, "Blob fetch", lambda: subprocess.run(
+            ["git", "--git-dir", git_dir, "-c", "fetch.negotiationAlgorithm=noop",
+             "fetch", "origin", "--no-tags", "--no-write-fetch-head", "--recurse-submodules=no",
+             "--filter=blob:none", "--stdin"],
+            input="\n".join(wanted) + "\n", check=True, capture_output=True, text=True, env=git_env()
+        ))
+
+class MirrorStore:
+    """
+    Persistent bare mirrors under cache_dir, one per normalized remote URL.
+    The first request for a remote clones it, later requests only fetch.
+    mirrors.json tracks size and last use of every mirror for LRU eviction.
+    Clones and fetches go through remotes.
+    """
+
+    def __init__(self, cache_dir=Config.mirror_cache_dir, max_bytes=Config.mirror_cache_max_bytes,
+                 blob_filter=Config.mirror_blob_filter, remotes=None, index_file=Config.mirror_index_file):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.blob_filter = blob_filter
+        self.remotes = remotes or GitRemotes()
+        self.index_path = os.path.join(cache_dir, index_file)
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index = load_json_file(self.index_path, {})
+        self._lock = threading.Lock()
+        self._remote_locks = {}
+
+    @classmethod
+    def from_config(cls, config, remotes=None):
+        return cls(
+            config.mirror_cache_dir, config.mirror_cache_max_bytes, config.mirror_blob_filter,
+            remotes or GitRemotes.from_config(config), config.mirror_index_file
+        )
+
+    def mirror_path(self, repo_url):
+        key = normalize_repo_url(repo_url)
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+        repo_name = re.sub(r'[^\w\.-]', '_', key.split('/')[-1]) or "repo"
+        return os.path.join(self.cache_dir, f"{repo_name}_{digest}.git")
+
+    def _remote_lock(self, key):
+        with self._lock:
+            return self._remote_locks.setdefault(key, threading.Lock())
+
+    def ensure(self, repo_url):
+        """
+        Brings the mirror of repo_url up to date and returns its path.
+        A mirror that can no longer be fetched is dropped and cloned again.
+        """
+        key = normalize_repo_url(repo_url)
+        path = self.mirror_path(repo_url)
+
+        with self._remote_lock(key):
+            fetched = False
+            if os.path.isdir(path):
+                try:
+                    with Repo(path) as repo:
+                        repo.git.update_environment(GIT_TERMINAL_PROMPT="0")
+                        self.remotes.with_retries(repo_url, "Fetch", lambda: repo.git.fetch('origin', prune=True))
+                    fetched = True
+                except Exception as e:
+                    print(f"⚠️ Fetch into mirror of {repo_url} failed, re-cloning: {e}")
+                    shutil.rmtree(path, ignore_errors=True)
+
+            if not fetched:
+                partial_path = path + ".partial"
+                clone_options = {"filter": self.blob_filter} if self.blob_filter else {}
+
+                def clone():
+                    shutil.rmtree(partial_path, ignore_errors=True)
+                    # Servers without filter support ignore it and send a full mirror
+                    Repo.clone_from(repo_url, partial_path, mirror=True, env=git_env(), **clone_options).close()
+
+                self.remotes.with_retries(repo_url, "Clone", clone)
+                os.replace(partial_path, path)
+
+            size = directory_size(path)
+            with self._lock:
+                self.index[key] = {
+                    "url": repo_url,
+                    "path": os.path.basename(path),
+                    "size": size,
+                    "last_used": time.time(),
+                }
+
+        return path
+
+    def size_of(self, repo_url):
+        with self._lock:
+            return self.index.get(normalize_repo_url(repo_url), {}).get("size", 0)
+
+    def total_size(self):
+        with self._lock:
+            return sum(entry.get("size", 0) for entry in self.index.values())
+
+    def evict(self, active_urls):
+        """
+        Removes mirrors of remotes that no longer appear in any list, least
+        recently used first, until the store fits in max_bytes.
+        Returns the URLs of the evicted mirrors.
+        """
+        active = {normalize_repo_url(url) for url in active_urls}
+        evicted = []
+
+        with self._lock:
+            total = sum(entry.get("size", 0) for entry in self.index.values())
+            stale = sorted(
+                (entry.get("last_used", 0), key)
+                for key, entry in self.index.items()
+                if key not in active
+            )
+            for _, key in stale:
+                if total <= self.max_bytes:
+                    break
+                entry = self.index.pop(key)
+                shutil.rmtree(os.path.join(self.cache_dir, entry["path"]), ignore_errors=True)
+                total -= entry.get("size", 0)
+                evicted.append(entry["url"])
+
+        return evicted
+
+    def save(self):
+        with self._lock:
+            save_json_file(self.index_path, self.index)
+
+def list_cs_blobs(git_dir, treeish="HEAD"):
+    """
+    Lists the .cs files in the tree of treeish without checking anything out.
+    Returns: [(path, blob_sha)]
+    """
+    # No -l: sizes of blobs missing from a partial mirror are fetched one blob at a time
+    output = subprocess.run(
+        ["git", "--git-dir", git_dir, "ls-tree", "-r", "-z", "--full-tree", treeish],
+        check=True, capture_output=True
+    ).stdout.decode('utf-8', errors='surrogateescape')
+
+    blobs = []
+    for record in output.split('\0'):
+        if not record:
+            continue
+        meta, path = record.split('\t', 1)
+        _, kind, sha = meta.split()
+        if kind == "blob" and path.endswith(".cs"):
+            blobs.append((path, sha))
+    return blobs
+
+def blob_sizes(git_dir, blob_shas):
+    """Returns: {blob_sha: size} for blobs that are present locally (prefetch first in a partial mirror)."""
+    if not blob_shas:
+        return {}
+    output = subprocess.run(
+        ["git", "--git-dir", git_dir, "cat-file", "--batch-check=%(objectname) %(objectsize)"],
+        input="\n".join(blob_shas) + "\n", check=True, capture_output=True, text=True
+    ).stdout
+    sizes = {}
+    for line in output.splitlines():
+        sha, size = line.split()
+        sizes[sha] = int(size)
+    return sizes
+
+def iter_blob_data(git_dir, blob_shas):
+    """
+    Streams blob contents through one long-lived `git cat-file --batch`.
+    Requests are written from a separate thread so git never waits on us.
+    Yields: (blob_sha, bytes)
+    """
+    process = subprocess.Popen(
+        ["git", "--git-dir", git_dir, "cat-file", "--batch"],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE
+    )
+
+    def write_requests():
+        try:
+            for sha in blob_shas:
+                process.stdin.write(sha.encode('ascii') + b"\n")
+        except BrokenPipeError:
+            pass
+        finally:
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+
+    writer = threading.Thread(target=write_requests, daemon=True)
+    writer.start()
+
+    try:
+        for sha in blob_shas:
+            header = process.stdout.readline().split()
+            if len(header) != 3:
+                raise RuntimeError(f"git cat-file could not read {sha}: {b' '.join(header).decode()}")
+            size = int(header[2])
+            data = process.stdout.read(size)
+            process.stdout.read(1)  # trailing newline
+            yield header[0].decode('ascii'), data
+    finally:
+        process.stdout.close()
+        process.kill()
+        process.wait()
+        writer.join()
+
+def iter_blob_chunks(git_dir, blob_sha, limit=None, chunk_bytes=Config.scan_chunk_bytes):
+    """Streams one blob in chunk_bytes pieces, for blobs too large to read whole."""
+    process = subprocess.Popen(["git", "--git-dir", git_dir, "cat-file", "blob", blob_sha], stdout=subprocess.PIPE)
+    try:
+        yield from iter_file_chunks(process.stdout, limit, chunk_bytes)
+    finally:
+        process.stdout.close()
+        process.kill()
+        process.wait()
+
+def list_versions(git_dir):
+    """
+    Tagged commits of a mirror, oldest first, followed by HEAD when no tag
+    points at it.
+    Returns: [(version label, commit_sha, commit time)]
+    """
+    output = subprocess.run(
+        ["git", "--git-dir", git_dir, "for-each-ref", "refs/tags",
+         "--format=%(refname:short)%00%(objecttype)%00%(objectname)%00%(committerdate:unix)"
+         "%00%(*objecttype)%00%(*objectname)%00%(*committerdate:unix)"],
+        check=True, capture_output=True, text=True
+    ).stdout
+
+    versions = []
+    for line in output.splitlines():
+        tag, kind, sha, date, peeled_kind, peeled_sha, peeled_date = line.split('\0')
+        # Annotated tags are peeled to their commit; tags of trees or blobs are no versions
+        if peeled_kind:
+            kind, sha, date = peeled_kind, peeled_sha, peeled_date
+        if kind == "commit":
+            versions.append((tag, sha, int(date)))
+
+    head = subprocess.run(
+        ["git", "--git-dir", git_dir, "log", "-1", "--format=%H %ct", "HEAD"],
+        capture_output=True, text=True
+    ).stdout.split()
+    if head and head[0] not in {sha for _, sha, _ in versions}:
+        versions.append(("HEAD", head[0], int(head[1])))
+
+    versions.sort(key=lambda version: (version[2], version[0]))
+    return versions
+
+def diff_cs_blobs(git_dir, old_commit, new_commit):
+    """
+    .cs files that differ between two commits, from the trees alone.
+    Returns: ([(path, blob_sha)] added or modified, [paths] deleted)
+    """
+    output = subprocess.run(
+        ["git", "--git-dir", git_dir, "diff-tree", "-r", "-z", "--no-renames", old_commit, new_commit],
+        check=True, capture_output=True
+    ).stdout.decode('utf-8', errors='surrogateescape')
+
+    changed, deleted = [], []
+    records = output.split('\0')
+    for meta, path in zip(records[0::2], records[1::2]):
+        if not path.endswith(".cs"):
+            continue
+        _, new_mode, _, new_sha, _ = meta.split()
+        # Deleted, or no longer a regular file (symlink, submodule)
+        if new_mode in ("100644", "100755"):
+            changed.append((path, new_sha))
+        else:
+            deleted.append(path)
+    return changed, deleted
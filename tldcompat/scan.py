@@ -0,0 +1,63 @@
+"""
+Scanning .cs files from disk in bounded memory, with a size guard for huge
+generated or decompiled files.
+"""
+import os
+from pathlib import Path
+
+from .extract import extract_harmony_patches_from_bytes, extract_harmony_patches_from_chunks
+
+MAX_SCAN_FILE_BYTES = 2 * 1024 * 1024  # Larger .cs files (decompiled/generated code) are handled by the oversize policy
+OVERSIZE_POLICY = "stream"  # "stream" scans them in chunks, "head" only the first max_bytes, "skip" ignores them
+SCAN_CHUNK_BYTES = 1024 * 1024
+
+def iter_file_chunks(file, limit=None, chunk_bytes=SCAN_CHUNK_BYTES):
+    """Reads a binary file object in chunks, stopping after limit bytes if given."""
+    remaining = limit
+    while remaining is None or remaining > 0:
+        chunk = file.read(chunk_bytes if remaining is None else min(chunk_bytes, remaining))
+        if not chunk:
+            return
+        if remaining is not None:
+            remaining -= len(chunk)
+        yield chunk
+
+def oversize_limit(size, path, max_bytes=MAX_SCAN_FILE_BYTES, policy=OVERSIZE_POLICY):
+    """
+    Applies the oversize policy to a file of size bytes.
+    Returns: (scan, limit) where limit is the number of bytes to scan, None for all.
+    """
+    if size <= max_bytes:
+        return True, None
+    if policy == "skip":
+        print(f"⚠️ Skipping {path}: {size / (1024 * 1024):.1f} MB is over the scan size limit")
+        return False, None
+    return True, max_bytes if policy == "head" else None
+
+def extract_harmony_patches_from_file(path, max_bytes=MAX_SCAN_FILE_BYTES, policy=OVERSIZE_POLICY,
+                                      chunk_bytes=SCAN_CHUNK_BYTES):
+    """
+    Scans a file from disk in bounded memory: files up to max_bytes are read
+    whole, larger ones follow policy.
+    Returns the patches, or None when the policy skips the file.
+    """
+    scan, limit = oversize_limit(os.path.getsize(path), path, max_bytes, policy)
+    if not scan:
+        return None
+    with open(path, 'rb') as file:
+        if limit is None and os.fstat(file.fileno()).st_size <= max_bytes:
+            return extract_harmony_patches_from_bytes(file.read())
+        return extract_harmony_patches_from_chunks(iter_file_chunks(file, limit, chunk_bytes))
+
+def extract_patches_from_directory(source_dir, max_bytes=MAX_SCAN_FILE_BYTES, policy=OVERSIZE_POLICY):
+    """Runs the extractor over every .cs file below source_dir. Returns: {patch: [relative paths]}"""
+    patches = {}
+    for path in sorted(Path(source_dir).rglob("*.cs")):
+        try:
+            found = extract_harmony_patches_from_file(path, max_bytes, policy)
+        except Exception as e:
+            print(f"⚠️ Error reading {path}: {e}")
+            continue
+        for patch in found or []:
+            patches.setdefault(patch, []).append(str(path.relative_to(source_dir)))
+    return patches
@@ -0,0 +1,242 @@
+"""
+Where crawl results live: JSON files or SQLite, plus the journal that makes a crawl resumable.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .config import Config
+from .index import PatchIndex
+from .util import load_json_file, save_json_file
+
+class JsonStorage:
+    """
+    Results in patch_map.json and mod_cache.json, read in full at startup and
+    rewritten in full by save().
+    """
+
+    def __init__(self, patch_map_path=Config.patch_map_file, mod_cache_path=Config.mod_cache_file):
+        self.patch_map_path = patch_map_path
+        self.mod_cache_path = mod_cache_path
+
+    def load(self):
+        """Returns: (PatchIndex, mod_cache)"""
+        return PatchIndex.from_patch_map(load_json_file(self.patch_map_path, {})), load_json_file(self.mod_cache_path, {})
+
+    def commit_mod(self, mod_name, cache_entry, patches):
+        pass  # Everything is written by save()
+
+    def save(self, patch_index, mod_cache):
+        for mod_name, cache_entry in mod_cache.items():
+            cache_entry["patches"] = sorted(patch_index.patches_for(mod_name))
+        save_json_file(self.patch_map_path, patch_index.to_patch_map())
+        save_json_file(self.mod_cache_path, mod_cache)
+
+    def close(self):
+        pass
+
+class SqliteStorage:
+    """
+    Results in an SQLite database. Every finished mod is committed as its own
+    transaction, so an interrupted crawl keeps everything finished so far.
+    Patches are indexed by name for prefix lookups; the legacy JSON files can
+    be exported at any time. One connection is shared by all threads and used
+    by one of them at a time, so a long-running process can serve lookups
+    from any thread.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS mods (
+            name TEXT PRIMARY KEY,
+            version TEXT,
+            commit_sha TEXT,
+            meta TEXT NOT NULL DEFAULT '{}'
+        );
+        CREATE TABLE IF NOT EXISTS patches (
+            patch TEXT NOT NULL,
+            mod TEXT NOT NULL,
+            PRIMARY KEY (patch, mod)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS patches_by_mod ON patches (mod);
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(self.SCHEMA)
+        self._lock = threading.Lock()
+
+    def is_empty(self):
+        with self._lock:
+            return self.connection.execute("SELECT 1 FROM mods LIMIT 1").fetchone() is None
+
+    def import_json(self, patch_map_path=Config.patch_map_file, mod_cache_path=Config.mod_cache_file):
+        """Seeds the database from the legacy JSON files."""
+        patch_index, mod_cache = JsonStorage(patch_map_path, mod_cache_path).load()
+        with self._lock, self.connection:
+            for mod_name, cache_entry in mod_cache.items():
+                self._upsert_mod(mod_name, cache_entry)
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO patches (patch, mod) VALUES (?, ?)",
+                ((patch, mod_name) for patch, mods in patch_index.mods_by_patch.items() for mod_name in mods)
+            )
+
+    def load(self):
+        """Returns: (PatchIndex, mod_cache)"""
+        with self._lock:
+            patch_rows = self.connection.execute("SELECT patch, mod FROM patches").fetchall()
+            mod_rows = self.connection.execute("SELECT name, version, commit_sha, meta FROM mods").fetchall()
+
+        patch_index = PatchIndex()
+        for patch, mod_name in patch_rows:
+            patch_index.add(mod_name, [patch])
+
+        mod_cache = {}
+        for name, version, commit_sha, meta in mod_rows:
+            entry = json.loads(meta)
+            entry["version"] = version
+            if commit_sha:
+                entry["commit"] = commit_sha
+            mod_cache[name] = entry
+        return patch_index, mod_cache
+
+    def _upsert_mod(self, mod_name, cache_entry):
+        meta = {key: value for key, value in cache_entry.items() if key not in ("version", "commit", "patches")}
+        self.connection.execute(
+            "INSERT INTO mods (name, version, commit_sha, meta) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET version = excluded.version, commit_sha = excluded.commit_sha, meta = excluded.meta",
+            (mod_name, cache_entry.get("version"), cache_entry.get("commit"), json.dumps(meta))
+        )
+
+    def commit_mod(self, mod_name, cache_entry, patches):
+        with self._lock, self.connection:
+            self._upsert_mod(mod_name, cache_entry)
+            self.connection.execute("DELETE FROM patches WHERE mod = ?", (mod_name,))
+            self.connection.executemany(
+                "INSERT INTO patches (patch, mod) VALUES (?, ?)",
+                ((patch, mod_name) for patch in set(patches))
+            )
+
+    def save(self, patch_index, mod_cache):
+        # Patch rows are already committed per mod; only version-only updates are left
+        with self._lock, self.connection:
+            for mod_name, cache_entry in mod_cache.items():
+                self._upsert_mod(mod_name, cache_entry)
+
+    def mods_for(self, patch):
+        with self._lock:
+            rows = self.connection.execute("SELECT mod FROM patches WHERE patch = ? ORDER BY mod", (patch,)).fetchall()
+        return [mod for (mod,) in rows]
+
+    def find_patches(self, prefix):
+        """
+        Patches equal to prefix (a namespace, class or "Class.Method") or nested
+        below it, answered from the primary key index. Like PatchIndex.patches_under,
+        "Panel_Map" does not match "Panel_MapExtra".
+        Returns: {patch: [mods]}
+        """
+        with self._lock:
+            if prefix:
+                # "/" is the character right after "." so this bounds everything starting with prefix + "."
+                rows = self.connection.execute(
+                    "SELECT patch, mod FROM patches WHERE patch = ? OR (patch >= ? AND patch < ?) ORDER BY patch, mod",
+                    (prefix, prefix + ".", prefix + "/")
+                ).fetchall()
+            else:
+                rows = self.connection.execute("SELECT patch, mod FROM patches ORDER BY patch, mod").fetchall()
+        found = {}
+        for patch, mod_name in rows:
+            found.setdefault(patch, []).append(mod_name)
+        return found
+
+    def export_json(self, patch_map_path=Config.patch_map_file, mod_cache_path=Config.mod_cache_file):
+        JsonStorage(patch_map_path, mod_cache_path).save(*self.load())
+
+    def close(self):
+        with self._lock:
+            self.connection.close()
+
+def open_storage(config):
+    if not config.storage_db_file:
+        return JsonStorage(config.patch_map_file, config.mod_cache_file)
+    storage = SqliteStorage(config.storage_db_file)
+    if storage.is_empty() and os.path.exists(config.patch_map_file):
+        print(f"📥 Importing {config.patch_map_file} and {config.mod_cache_file} into {config.storage_db_file}")
+        storage.import_json(config.patch_map_file, config.mod_cache_file)
+    return storage
+
+class ResultJournal:
+    """
+    Append-only JSON-lines log of every mod a crawl finishes. Each record is
+    flushed immediately and fsynced in batches, so a killed run loses at most
+    the last batch. After the results are saved the journal is deleted; one
+    that is still around belongs to an interrupted run and can be replayed.
+    """
+
+    def __init__(self, path=Config.journal_file, fsync_every=Config.journal_fsync_every, fsync_seconds=Config.journal_fsync_seconds):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_seconds = fsync_seconds
+        self.file = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    @staticmethod
+    def _read(path):
+        """Returns: (complete records, bytes they take up at the start of the file)"""
+        records, length = [], 0
+        try:
+            with open(path, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # Torn final write of a killed run
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        break
+                    length += len(line)
+        except FileNotFoundError:
+            pass
+        return records, length
+
+    @staticmethod
+    def replay(path=Config.journal_file):
+        """Returns the complete records of a previous run's journal."""
+        return ResultJournal._read(path)[0]
+
+    def open(self, append=False):
+        self.file = open(self.path, 'a' if append else 'w', encoding='utf-8')
+        if append:
+            # Drop a torn final record, or the first new one would be glued onto it
+            self.file.truncate(self._read(self.path)[1])
+        return self
+
+    def append(self, record):
+        self.file.write(json.dumps(record, separators=(',', ':')) + "\n")
+        self.file.flush()
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_seconds:
+            self.sync()
+
+    def sync(self):
+        if self.file and self._unsynced:
+            os.fsync(self.file.fileno())
+            self._unsynced = 0
+            self._last_sync = time.monotonic()
+
+    def close(self):
+        if self.file:
+            self.sync()
+            self.file.close()
+            self.file = None
+
+    def discard(self):
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,52 @@
+"""
+Small helpers shared by every layer: JSON files, repo URLs, directory sizes.
+"""
+import os
+import json
+
+def save_json_file(path, data, compact=False):
+    # Write to a temp file and rename over the target so a crash never leaves a half-written file
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        if compact:
+            json.dump(data, f, separators=(',', ':'))
+        else:
+            json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+def load_json_file(path, default):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return default
+
+def normalize_repo_url(repo_url):
+    """
+    Canonical form of a remote URL so that "https://github.com/A/B/",
+    "https://github.com/a/b.git" etc. share one mirror.
+    """
+    url = repo_url.strip().rstrip('/')
+    if url.endswith('.git'):
+        url = url[:-4]
+    scheme, sep, rest = url.partition('://')
+    if not sep:
+        return url
+    host, slash, path = rest.partition('/')
+    host = host.lower()
+    if host in ("github.com", "www.github.com"):
+        # GitHub owner and repo names are case-insensitive
+        host, path = "github.com", path.lower()
+    return f"{scheme.lower()}://{host}{slash}{path}"
+
+def directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total